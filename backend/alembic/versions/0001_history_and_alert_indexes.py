@@ -0,0 +1,44 @@
+"""Add composite indexes for history and alert queries
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+from sqlalchemy import text
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Tables may already exist from Base.metadata.create_all, so every index is
+# created with IF NOT EXISTS, and CONCURRENTLY to avoid locking large tables.
+# Partitioned tables (weather_readings created from the current models) do not
+# support CONCURRENTLY, and Postgres rejects it before checking IF NOT EXISTS.
+INDEXES = [
+    # get_weather_history and the current weather cache: city + time range, newest first
+    ("ix_weather_readings_city_timestamp", "weather_readings", "city, timestamp DESC"),
+    # get_latest_readings: newest readings across all cities
+    ("ix_weather_readings_timestamp", "weather_readings", "timestamp DESC"),
+    # get_alerts and get_alert_stats: time window filtered by type and resolution
+    ("ix_alerts_created_at_type_resolved", "alerts", "created_at, alert_type, is_resolved"),
+    # get_alerts filtered by city, newest first
+    ("ix_alerts_city_created_at", "alerts", "city, created_at DESC"),
+]
+
+def concurrently(table: str) -> str:
+    relkind = op.get_bind().execute(text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"
+    ), {"table": table}).scalar()
+    return "" if relkind == "p" else "CONCURRENTLY "
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.execute(f"CREATE INDEX {concurrently(table)}IF NOT EXISTS {name} ON {table} ({columns})")
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.execute(f"DROP INDEX {concurrently(table)}IF EXISTS {name}")
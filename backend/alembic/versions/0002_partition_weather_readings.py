@@ -0,0 +1,123 @@
+"""Range-partition weather_readings by day and add hourly/daily rollups
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+from sqlalchemy import text
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+ROLLUP_TABLES = ("weather_readings_hourly", "weather_readings_daily")
+
+def upgrade():
+    # A table created from the current models is already partitioned ('p');
+    # only a plain table ('r') from an older create_all is converted
+    relkind = op.get_bind().execute(text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass('weather_readings')"
+    )).scalar()
+    if relkind == "r":
+        convert_readings_table()
+    
+    for table in ROLLUP_TABLES:
+        op.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                city VARCHAR NOT NULL,
+                bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+                sample_count INTEGER,
+                temperature_min DOUBLE PRECISION,
+                temperature_max DOUBLE PRECISION,
+                temperature_avg DOUBLE PRECISION,
+                humidity_min DOUBLE PRECISION,
+                humidity_max DOUBLE PRECISION,
+                humidity_avg DOUBLE PRECISION,
+                pressure_min DOUBLE PRECISION,
+                pressure_max DOUBLE PRECISION,
+                pressure_avg DOUBLE PRECISION,
+                aqi_min DOUBLE PRECISION,
+                aqi_max DOUBLE PRECISION,
+                aqi_avg DOUBLE PRECISION,
+                PRIMARY KEY (city, bucket_start)
+            )
+        """)
+
+def convert_readings_table():
+    # Keep the old table aside; its id sequence is reused by the partitioned table
+    op.execute("ALTER TABLE weather_readings RENAME TO weather_readings_legacy")
+    for name in ("weather_readings_pkey", "ix_weather_readings_id", "ix_weather_readings_city",
+                 "ix_weather_readings_city_timestamp", "ix_weather_readings_timestamp"):
+        op.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name.replace('weather_readings', 'weather_readings_legacy')}")
+    
+    op.execute("""
+        CREATE TABLE weather_readings (
+            id INTEGER NOT NULL DEFAULT nextval('weather_readings_id_seq'),
+            city VARCHAR,
+            temperature DOUBLE PRECISION,
+            humidity DOUBLE PRECISION,
+            pressure DOUBLE PRECISION,
+            aqi INTEGER,
+            weather_condition VARCHAR,
+            timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE weather_readings_id_seq OWNED BY weather_readings.id")
+    op.execute("CREATE INDEX ix_weather_readings_id ON weather_readings (id)")
+    op.execute("CREATE INDEX ix_weather_readings_city ON weather_readings (city)")
+    op.execute("CREATE INDEX ix_weather_readings_city_timestamp ON weather_readings (city, timestamp DESC)")
+    op.execute("CREATE INDEX ix_weather_readings_timestamp ON weather_readings (timestamp DESC)")
+    op.execute("CREATE TABLE weather_readings_default PARTITION OF weather_readings DEFAULT")
+    
+    # One partition per day from the oldest existing reading through next week
+    op.execute("""
+        DO $$
+        DECLARE
+            day DATE;
+        BEGIN
+            SELECT COALESCE(min(timestamp AT TIME ZONE 'UTC')::date, current_date)
+              INTO day FROM weather_readings_legacy;
+            WHILE day <= current_date + 7 LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF weather_readings FOR VALUES FROM (%L) TO (%L)',
+                    'weather_readings_p' || to_char(day, 'YYYYMMDD'), day::timestamptz, (day + 1)::timestamptz
+                );
+                day := day + 1;
+            END LOOP;
+        END $$
+    """)
+    op.execute("""
+        INSERT INTO weather_readings (id, city, temperature, humidity, pressure, aqi, weather_condition, timestamp)
+        SELECT id, city, temperature, humidity, pressure, aqi, weather_condition, COALESCE(timestamp, now())
+        FROM weather_readings_legacy
+    """)
+    op.execute("DROP TABLE weather_readings_legacy")
+
+def downgrade():
+    for table in ROLLUP_TABLES:
+        op.execute(f"DROP TABLE IF EXISTS {table}")
+    
+    op.execute("ALTER TABLE weather_readings RENAME TO weather_readings_partitioned")
+    op.execute("ALTER INDEX weather_readings_pkey RENAME TO weather_readings_partitioned_pkey")
+    op.execute("""
+        CREATE TABLE weather_readings (
+            id INTEGER PRIMARY KEY DEFAULT nextval('weather_readings_id_seq'),
+            city VARCHAR,
+            temperature DOUBLE PRECISION,
+            humidity DOUBLE PRECISION,
+            pressure DOUBLE PRECISION,
+            aqi INTEGER,
+            weather_condition VARCHAR,
+            timestamp TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+    """)
+    op.execute("INSERT INTO weather_readings SELECT * FROM weather_readings_partitioned")
+    op.execute("ALTER SEQUENCE weather_readings_id_seq OWNED BY weather_readings.id")
+    op.execute("DROP TABLE weather_readings_partitioned")
+    op.execute("CREATE INDEX ix_weather_readings_id ON weather_readings (id)")
+    op.execute("CREATE INDEX ix_weather_readings_city ON weather_readings (city)")
+    op.execute("CREATE INDEX ix_weather_readings_city_timestamp ON weather_readings (city, timestamp DESC)")
+    op.execute("CREATE INDEX ix_weather_readings_timestamp ON weather_readings (timestamp DESC)")
@@ -0,0 +1,43 @@
+"""Index weather_readings by normalized city for the current weather cache
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+from sqlalchemy import text
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEX = "ix_weather_readings_city_key_timestamp"
+# Must match app.models.weather.city_key, which the cache lookup filters on
+COLUMNS = r"lower(regexp_replace(trim(city), '\s+', ' ', 'g')), timestamp DESC"
+
+def upgrade():
+    bind = op.get_bind()
+    # Already built by create_all, or by an earlier run of this migration
+    valid = bind.execute(text(
+        "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"
+    ), {"name": INDEX}).scalar()
+    if valid:
+        return
+    
+    # weather_readings is partitioned, which rules out CONCURRENTLY on the parent.
+    # The parent index starts out invalid, is built per partition without blocking
+    # writes, and becomes valid once every partition's index is attached.
+    partitions = bind.execute(text(
+        "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'weather_readings'::regclass"
+    )).scalars().all()
+    op.execute(f"CREATE INDEX IF NOT EXISTS {INDEX} ON ONLY weather_readings ({COLUMNS})")
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            name = f"{partition}_city_key_idx"
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {partition} ({COLUMNS})")
+            op.execute(f"ALTER INDEX {INDEX} ATTACH PARTITION {name}")
+
+def downgrade():
+    # Dropping the parent index drops the partitions' indexes attached to it
+    op.execute(f"DROP INDEX IF EXISTS {INDEX}")
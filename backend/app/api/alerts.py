@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime, timedelta
-from app.core.database import get_db
+from app.core.cache import get_redis
+from app.core.config import settings
+from app.core.database import get_async_db
 from app.models.weather import Alert
+from app.services import alert_bus, alert_stats
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -25,7 +28,7 @@ class AlertResponse(BaseModel):
 
 @router.get("/", response_model=List[AlertResponse])
 async def get_alerts(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     city: Optional[str] = Query(None, description="Filter by city"),
     alert_type: Optional[str] = Query(None, description="Filter by alert type"),
     resolved: Optional[bool] = Query(None, description="Filter by resolution status"),
@@ -35,68 +38,48 @@ async def get_alerts(
     """Get alerts with optional filters"""
     since = datetime.utcnow() - timedelta(hours=hours)
     
-    query = db.query(Alert).filter(Alert.created_at >= since)
+    query = select(Alert).where(Alert.created_at >= since)
     
     if city:
-        query = query.filter(Alert.city == city)
+        query = query.where(Alert.city == city)
     if alert_type:
-        query = query.filter(Alert.alert_type == alert_type)
+        query = query.where(Alert.alert_type == alert_type)
     if resolved is not None:
-        query = query.filter(Alert.is_resolved == resolved)
+        query = query.where(Alert.is_resolved == resolved)
     
-    alerts = query.order_by(desc(Alert.created_at)).limit(limit).all()
-    return alerts
+    alerts = await db.scalars(query.order_by(desc(Alert.created_at)).limit(limit))
+    return alerts.all()
+
+@router.get("/replay")
+async def replay_alerts(
+    after: str = Query(..., description="Stream id of the last alert already received"),
+    limit: int = Query(100, ge=1, description="Maximum number of alerts"),
+    redis_client=Depends(get_redis)
+):
+    """Alerts published after a stream id, read from the alert stream"""
+    if not alert_bus.is_stream_id(after):
+        raise HTTPException(status_code=400, detail="Invalid stream id")
+    return await alert_bus.read_since(redis_client, after, limit=min(limit, settings.ALERT_REPLAY_LIMIT))
 
 @router.put("/{alert_id}/resolve")
-async def resolve_alert(alert_id: int, db: Session = Depends(get_db)):
+async def resolve_alert(alert_id: int, db: AsyncSession = Depends(get_async_db), redis_client=Depends(get_redis)):
     """Mark an alert as resolved"""
-    alert = db.query(Alert).filter(Alert.id == alert_id).first()
+    alert = await db.get(Alert, alert_id)
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
     alert.is_resolved = True
     alert.resolved_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
+    await alert_stats.invalidate_alert_stats(redis_client)
     
     return {"message": "Alert resolved successfully"}
 
 @router.get("/stats")
 async def get_alert_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    redis_client=Depends(get_redis),
     hours: int = Query(24, description="Hours to look back")
 ):
     """Get alert statistics"""
-    since = datetime.utcnow() - timedelta(hours=hours)
-    
-    total_alerts = db.query(Alert).filter(Alert.created_at >= since).count()
-    resolved_alerts = db.query(Alert).filter(
-        Alert.created_at >= since,
-        Alert.is_resolved == True
-    ).count()
-    
-    # Count by type
-    temp_alerts = db.query(Alert).filter(
-        Alert.created_at >= since,
-        Alert.alert_type == "temperature"
-    ).count()
-    
-    humidity_alerts = db.query(Alert).filter(
-        Alert.created_at >= since,
-        Alert.alert_type == "humidity"
-    ).count()
-    
-    aqi_alerts = db.query(Alert).filter(
-        Alert.created_at >= since,
-        Alert.alert_type == "aqi"
-    ).count()
-    
-    return {
-        "total_alerts": total_alerts,
-        "resolved_alerts": resolved_alerts,
-        "unresolved_alerts": total_alerts - resolved_alerts,
-        "by_type": {
-            "temperature": temp_alerts,
-            "humidity": humidity_alerts,
-            "aqi": aqi_alerts
-        }
-    }
\ No newline at end of file
+    return await alert_stats.get_alert_stats(db, redis_client, hours)
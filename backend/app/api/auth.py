@@ -1,13 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from pydantic import BaseModel, EmailStr
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.security import (
-    verify_password, get_password_hash, create_access_token,
-    ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user
+    password_hasher, create_access_token,
+    ACCESS_TOKEN_EXPIRE_MINUTES, get_current_principal
 )
+from app.core.auth_cache import Principal
 from app.models.user import User
 
 router = APIRouter()
@@ -31,11 +33,11 @@ class Token(BaseModel):
     token_type: str
 
 @router.post("/register", response_model=UserResponse)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user already exists
-    db_user = db.query(User).filter(
+    db_user = await db.scalar(select(User).where(
         (User.email == user.email) | (User.username == user.username)
-    ).first()
+    ))
     
     if db_user:
         raise HTTPException(
@@ -44,7 +46,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -52,16 +54,16 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == form_data.username))
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -76,5 +78,5 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: Principal = Depends(get_current_principal)):
     return current_user
\ No newline at end of file
@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from pydantic import BaseModel
-from app.core.database import get_db
-from app.core.security import get_current_user
-from app.models.user import User, CustomAlert, UserCity
+from app.core.cache import get_redis
+from app.core.database import get_async_db
+from app.core.auth_cache import Principal
+from app.core.security import get_current_principal
+from app.models.user import CustomAlert, UserCity
+from app.services.rule_engine import publish_rule_change
 
 router = APIRouter()
 
@@ -46,39 +50,42 @@ class UserCityResponse(BaseModel):
 @router.post("/alerts", response_model=CustomAlertResponse)
 async def create_custom_alert(
     alert: CustomAlertCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+    redis_client=Depends(get_redis)
 ):
     db_alert = CustomAlert(
         user_id=current_user.id,
         **alert.dict()
     )
     db.add(db_alert)
-    db.commit()
-    db.refresh(db_alert)
+    await db.commit()
+    await db.refresh(db_alert)
+    await publish_rule_change(redis_client, db_alert, current_user.email)
     return db_alert
 
 @router.get("/alerts", response_model=List[CustomAlertResponse])
 async def get_user_alerts(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    alerts = db.query(CustomAlert).filter(
+    alerts = await db.scalars(select(CustomAlert).where(
         CustomAlert.user_id == current_user.id
-    ).all()
-    return alerts
+    ))
+    return alerts.all()
 
 @router.put("/alerts/{alert_id}")
 async def update_custom_alert(
     alert_id: int,
     alert_update: CustomAlertCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+    redis_client=Depends(get_redis)
 ):
-    alert = db.query(CustomAlert).filter(
+    alert = await db.scalar(select(CustomAlert).where(
         CustomAlert.id == alert_id,
         CustomAlert.user_id == current_user.id
-    ).first()
+    ))
     
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
@@ -86,66 +93,69 @@ async def update_custom_alert(
     for key, value in alert_update.dict().items():
         setattr(alert, key, value)
     
-    db.commit()
+    await db.commit()
+    await publish_rule_change(redis_client, alert, current_user.email)
     return {"message": "Alert updated successfully"}
 
 @router.delete("/alerts/{alert_id}")
 async def delete_custom_alert(
     alert_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+    redis_client=Depends(get_redis)
 ):
-    alert = db.query(CustomAlert).filter(
+    alert = await db.scalar(select(CustomAlert).where(
         CustomAlert.id == alert_id,
         CustomAlert.user_id == current_user.id
-    ).first()
+    ))
     
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
-    db.delete(alert)
-    db.commit()
+    await db.delete(alert)
+    await db.commit()
+    await publish_rule_change(redis_client, alert, current_user.email, deleted=True)
     return {"message": "Alert deleted successfully"}
 
 @router.post("/cities", response_model=UserCityResponse)
 async def add_user_city(
     city: UserCityCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     db_city = UserCity(
         user_id=current_user.id,
         **city.dict()
     )
     db.add(db_city)
-    db.commit()
-    db.refresh(db_city)
+    await db.commit()
+    await db.refresh(db_city)
     return db_city
 
 @router.get("/cities", response_model=List[UserCityResponse])
 async def get_user_cities(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    cities = db.query(UserCity).filter(
+    cities = await db.scalars(select(UserCity).where(
         UserCity.user_id == current_user.id
-    ).all()
-    return cities
+    ))
+    return cities.all()
 
 @router.delete("/cities/{city_id}")
 async def delete_user_city(
     city_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    city = db.query(UserCity).filter(
+    city = await db.scalar(select(UserCity).where(
         UserCity.id == city_id,
         UserCity.user_id == current_user.id
-    ).first()
+    ))
     
     if not city:
         raise HTTPException(status_code=404, detail="City not found")
     
-    db.delete(city)
-    db.commit()
+    await db.delete(city)
+    await db.commit()
     return {"message": "City removed successfully"}
\ No newline at end of file
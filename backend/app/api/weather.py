@@ -1,64 +1,105 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
-from datetime import datetime, timedelta
-from app.core.database import get_db
-from app.models.weather import WeatherReading
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from datetime import datetime, timedelta, timezone
+from app.core.cache import get_redis
+from app.core.database import get_async_db
+from app.core.encoding import negotiate_columnar, columnar_response
+from app.services import history
 from app.services.weather_service import WeatherService
+from app.services.weather_cache import WeatherCache
 from pydantic import BaseModel
 
 router = APIRouter()
 weather_service = WeatherService()
+weather_cache = WeatherCache(weather_service)
 
 class WeatherResponse(BaseModel):
-    id: int
+    # id and weather_condition are empty for history served from rollups
+    id: Optional[int]
     city: str
     temperature: float
     humidity: float
     pressure: float
     aqi: Optional[int]
-    weather_condition: str
+    weather_condition: Optional[str]
     timestamp: datetime
     
     class Config:
         from_attributes = True
 
+class WeatherBucketResponse(BaseModel):
+    city: str
+    bucket_start: datetime
+    sample_count: int
+    temperature_min: Optional[float]
+    temperature_max: Optional[float]
+    temperature_avg: Optional[float]
+    humidity_min: Optional[float]
+    humidity_max: Optional[float]
+    humidity_avg: Optional[float]
+    pressure_min: Optional[float]
+    pressure_max: Optional[float]
+    pressure_avg: Optional[float]
+    aqi_min: Optional[float]
+    aqi_max: Optional[float]
+    aqi_avg: Optional[float]
+
+BUCKET_PATTERN = f"^({'|'.join(history.BUCKETS)})$"
+
+FormatQuery = Query(None, description="Set to 'columnar' for one JSON array per field", pattern="^columnar$")
+
+def reading_rows_response(request: Request, rows, format: Optional[str]):
+    """Columnar encoding if negotiated, otherwise one object per reading"""
+    media_type = negotiate_columnar(request, format)
+    if media_type:
+        return columnar_response(history.READING_FIELDS, rows, media_type)
+    return [dict(zip(history.READING_FIELDS, row)) for row in rows]
+
 @router.get("/current/{city}", response_model=WeatherResponse)
-async def get_current_weather(city: str, db: Session = Depends(get_db)):
+async def get_current_weather(city: str, redis_client=Depends(get_redis)):
     """Get current weather for a city"""
     try:
-        weather_data = await weather_service.fetch_weather_data(city)
-        reading = weather_service.save_weather_reading(db, weather_data)
-        return reading
+        return await weather_cache.get_current(city, redis_client)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch weather data: {str(e)}")
 
-@router.get("/history/{city}", response_model=List[WeatherResponse])
+@router.get("/history", response_model=List[WeatherBucketResponse])
+async def get_multi_city_history(
+    db: AsyncSession = Depends(get_async_db),
+    cities: List[str] = Query(..., description="Cities to include"),
+    hours: int = Query(24, description="Number of hours to look back"),
+    bucket: str = Query("1h", description="Bucket size: 5m, 15m, 1h, 6h, 1d or 7d", pattern=BUCKET_PATTERN)
+):
+    """Get aggregated weather history for several cities"""
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    return await history.get_bucketed_history(db, cities, since, bucket)
+
+@router.get("/history/{city}", response_model=Union[List[WeatherBucketResponse], List[WeatherResponse]])
 async def get_weather_history(
     city: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     hours: int = Query(24, description="Number of hours to look back"),
-    limit: int = Query(100, description="Maximum number of records")
+    limit: int = Query(100, description="Maximum number of records"),
+    bucket: Optional[str] = Query(None, description="Aggregate into buckets: 5m, 15m, 1h, 6h, 1d or 7d",
+                                  pattern=BUCKET_PATTERN),
+    format: Optional[str] = FormatQuery
 ):
-    """Get weather history for a city"""
-    since = datetime.utcnow() - timedelta(hours=hours)
-    
-    readings = db.query(WeatherReading).filter(
-        WeatherReading.city == city,
-        WeatherReading.timestamp >= since
-    ).order_by(desc(WeatherReading.timestamp)).limit(limit).all()
-    
-    return readings
+    """Get weather history for a city, optionally aggregated into time buckets"""
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    if bucket:
+        return await history.get_bucketed_history(db, [city], since, bucket)
+    rows = await history.get_history(db, city, since, limit)
+    return reading_rows_response(request, rows, format)
 
 @router.get("/latest", response_model=List[WeatherResponse])
 async def get_latest_readings(
-    db: Session = Depends(get_db),
-    limit: int = Query(10, description="Number of latest readings")
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = Query(10, description="Number of latest readings"),
+    format: Optional[str] = FormatQuery
 ):
     """Get latest weather readings across all cities"""
-    readings = db.query(WeatherReading).order_by(
-        desc(WeatherReading.timestamp)
-    ).limit(limit).all()
-    
-    return readings
\ No newline at end of file
+    rows = await history.get_latest(db, limit)
+    return reading_rows_response(request, rows, format)
\ No newline at end of file
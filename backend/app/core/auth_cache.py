@@ -0,0 +1,74 @@
+import json
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Optional, Tuple
+from app.core.config import settings
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user's identity, enough for routes that do not need the ORM object"""
+    id: int
+    email: str
+    username: str
+    is_active: bool
+    
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(id=user.id, email=user.email, username=user.username, is_active=bool(user.is_active))
+
+class PrincipalCache:
+    """Bounded per-process LRU of token -> principal, backed by a Redis copy keyed by email
+
+    Local entries live for a short TTL (and never past the token's expiry) so that a
+    deactivation made on another replica takes effect within that TTL.
+    """
+    
+    REDIS_PREFIX = "auth:principal:"
+    
+    def __init__(self, max_size: Optional[int] = None, local_ttl: Optional[float] = None,
+                 shared_ttl: Optional[int] = None):
+        self.max_size = max_size or settings.AUTH_CACHE_SIZE
+        self.local_ttl = settings.AUTH_LOCAL_CACHE_TTL_SECONDS if local_ttl is None else local_ttl
+        self.shared_ttl = shared_ttl or settings.AUTH_CACHE_TTL_SECONDS
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+    
+    def get_local(self, token: str) -> Optional[Principal]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        principal, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return principal
+    
+    def set_local(self, token: str, principal: Principal, token_expires_at: Optional[float] = None):
+        expires_at = time.time() + self.local_ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        self._entries[token] = (principal, expires_at)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    async def get_shared(self, redis_client, email: str) -> Optional[Principal]:
+        if redis_client is None:
+            return None
+        data = await redis_client.get(self.REDIS_PREFIX + email)
+        return Principal(**json.loads(data)) if data else None
+    
+    async def set_shared(self, redis_client, principal: Principal):
+        if redis_client is not None:
+            await redis_client.set(self.REDIS_PREFIX + principal.email, json.dumps(asdict(principal)),
+                                   ex=self.shared_ttl)
+    
+    async def invalidate(self, redis_client, email: str):
+        """Forget a user everywhere this process can reach; call it wherever a user's is_active changes"""
+        for token in [token for token, (principal, _) in self._entries.items() if principal.email == email]:
+            del self._entries[token]
+        if redis_client is not None:
+            await redis_client.delete(self.REDIS_PREFIX + email)
+
+principal_cache = PrincipalCache()
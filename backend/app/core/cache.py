@@ -0,0 +1,40 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+from fastapi import Request
+
+def normalize_city(city: str) -> str:
+    """Normalize a city name for use as a cache key"""
+    return " ".join(city.split()).casefold()
+
+def get_redis(request: Request):
+    """Dependency returning the application's shared Redis client"""
+    return request.app.state.redis
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single in-flight call"""
+    
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    def is_inflight(self, key: str) -> bool:
+        return key in self._inflight
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or wait for the result of the call already running
+
+        fn runs in its own task, so a caller that is cancelled (such as a client that
+        disconnected) stops waiting without cancelling the call for everyone else.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when every caller has stopped waiting
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,58 @@
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+from fastapi import HTTPException, Request, Response
+
+# Binary columnar formats are optional; a request for a missing one gets a 406
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+def negotiate_columnar(request: Request, format: Optional[str] = None) -> Optional[str]:
+    """Media type for a columnar response, or None to keep the default row-per-object JSON"""
+    accept = request.headers.get("accept", "")
+    if ARROW_MEDIA_TYPE in accept:
+        return ARROW_MEDIA_TYPE
+    if any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES):
+        return MSGPACK_MEDIA_TYPES[0]
+    if format == "columnar":
+        return JSON_MEDIA_TYPE
+    return None
+
+def columnar_response(fields: Sequence[str], rows: List[Sequence[Any]], media_type: str) -> Response:
+    """Encode row tuples as one array per field"""
+    columns = list(zip(*rows)) if rows else [() for _ in fields]
+    
+    if media_type == ARROW_MEDIA_TYPE:
+        if pyarrow is None:
+            raise HTTPException(status_code=406, detail="Arrow responses require pyarrow to be installed")
+        table = pyarrow.table({field: list(column) for field, column in zip(fields, columns)})
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(content=sink.getvalue().to_pybytes(), media_type=media_type)
+    
+    # Timestamps become epoch milliseconds so JSON and MessagePack stay compact
+    data = {field: [_epoch_ms(value) for value in column] for field, column in zip(fields, columns)}
+    
+    if media_type in MSGPACK_MEDIA_TYPES:
+        if msgpack is None:
+            raise HTTPException(status_code=406, detail="MessagePack responses require msgpack to be installed")
+        return Response(content=msgpack.packb(data), media_type=media_type)
+    return Response(content=json.dumps(data, separators=(",", ":")), media_type=JSON_MEDIA_TYPE)
+
+def _epoch_ms(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    return value
@@ -0,0 +1,29 @@
+import httpx
+from typing import Optional
+from app.core.config import settings
+
+_client: Optional[httpx.AsyncClient] = None
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create a pooled HTTP client with keep-alive and configured limits"""
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=settings.HTTP2_ENABLED)
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
+
+async def close_http_client():
+    """Close the shared HTTP client and its pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
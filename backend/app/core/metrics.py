@@ -30,11 +30,55 @@ ALERT_COUNT = Counter(
     ['alert_type', 'city']
 )
 
+WEATHER_CACHE_REQUESTS = Counter(
+    'weather_cache_requests_total',
+    'Current weather cache lookups by result (hit, miss, coalesced)',
+    ['result']
+)
+
+ALERTS_PUBLISHED = Counter(
+    'weather_alerts_published_total',
+    'Alert messages published to Redis for WebSocket broadcasting'
+)
+
+ALERT_PUBLISH_DURATION = Histogram(
+    'weather_alert_publish_duration_seconds',
+    'Time to publish one batch of alerts to Redis'
+)
+
+NOTIFICATIONS = Counter(
+    'weather_notifications_total',
+    'Notification delivery attempts by channel and outcome (sent, retried, failed)',
+    ['channel', 'status']
+)
+
+NOTIFICATION_QUEUE_LAG = Histogram(
+    'weather_notification_queue_lag_seconds',
+    'Time notifications wait in the dispatch queue before a worker picks them up',
+    ['channel']
+)
+
+NOTIFICATION_QUEUE_DEPTH = Gauge(
+    'weather_notification_queue_depth',
+    'Notifications waiting in the dispatch queue'
+)
+
 ACTIVE_WEBSOCKET_CONNECTIONS = Gauge(
     'weather_websocket_connections_active',
     'Number of active WebSocket connections'
 )
 
+WEBSOCKET_SEND_QUEUE_DEPTH = Gauge(
+    'weather_websocket_send_queue_depth_max',
+    'Deepest per-connection WebSocket send queue after the last broadcast'
+)
+
+WEBSOCKET_SLOW_CONSUMERS = Counter(
+    'weather_websocket_slow_consumers_total',
+    'WebSocket sends dropped or connections closed because a client fell behind',
+    ['action']
+)
+
 SYSTEM_CPU_USAGE = Gauge(
     'weather_system_cpu_usage_percent',
     'System CPU usage percentage'
@@ -117,10 +161,39 @@ def record_alert(alert_type: str, city: str):
     """Record alert generation"""
     ALERT_COUNT.labels(alert_type=alert_type, city=city).inc()
 
+def record_alert_publish(count: int, duration: float):
+    """Record a published batch of alerts"""
+    ALERTS_PUBLISHED.inc(count)
+    ALERT_PUBLISH_DURATION.observe(duration)
+
+def record_notification(channel: str, status: str):
+    """Record a notification delivery attempt"""
+    NOTIFICATIONS.labels(channel=channel, status=status).inc()
+
+def record_notification_lag(channel: str, lag: float):
+    """Record how long a notification waited in the dispatch queue"""
+    NOTIFICATION_QUEUE_LAG.labels(channel=channel).observe(lag)
+
+def update_notification_queue_depth(depth: int):
+    """Update the notification dispatch queue depth"""
+    NOTIFICATION_QUEUE_DEPTH.set(depth)
+
+def record_weather_cache(result: str):
+    """Record a current weather cache lookup"""
+    WEATHER_CACHE_REQUESTS.labels(result=result).inc()
+
 def update_websocket_connections(count: int):
     """Update active WebSocket connections count"""
     ACTIVE_WEBSOCKET_CONNECTIONS.set(count)
 
+def update_websocket_queue_depth(depth: int):
+    """Update the deepest WebSocket send queue"""
+    WEBSOCKET_SEND_QUEUE_DEPTH.set(depth)
+
+def record_websocket_drop(action: str):
+    """Record a slow WebSocket consumer being dropped, disconnected or timed out"""
+    WEBSOCKET_SLOW_CONSUMERS.labels(action=action).inc()
+
 async def get_metrics():
     """Get Prometheus metrics"""
     # Update system metrics before returning
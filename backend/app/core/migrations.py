@@ -0,0 +1,28 @@
+import os
+from alembic import command
+from alembic.config import Config
+from app.core.database import engine, Base, SessionLocal
+from app.models import user, weather  # Register models on Base.metadata
+from app.services.retention import ensure_partitions
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def alembic_config() -> Config:
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    return config
+
+def prepare_database():
+    """Create missing tables, apply migrations and pre-create readings partitions
+
+    Run once before starting the API. Tables that already exist are left to the
+    migrations, which converge whether they came from an older create_all or from
+    the current models.
+    """
+    Base.metadata.create_all(bind=engine)
+    command.upgrade(alembic_config(), "head")
+    with SessionLocal() as db:
+        ensure_partitions(db)
+
+if __name__ == "__main__":
+    prepare_database()
@@ -1,11 +1,18 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.auth_cache import Principal, principal_cache
+from app.core.cache import get_redis
+from app.core.config import settings
+from app.core.database import get_async_db
 from app.models.user import User
 
 # Security configuration
@@ -22,6 +29,52 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """Runs bcrypt in a bounded thread pool so hashing never blocks the event loop
+
+    At most `workers` hashes run at once and up to `max_pending` more calls may wait
+    for a thread; beyond that requests are rejected with 503 instead of queueing
+    without bound. A call holds its slot until its hash finishes, even if the request
+    was cancelled while the thread kept running.
+    """
+    
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.workers = workers or settings.PASSWORD_HASH_WORKERS
+        self.max_pending = max_pending or settings.PASSWORD_HASH_MAX_PENDING
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        # Calls queued or running in the pool; released from the pool's threads
+        self._in_flight = 0
+        self._lock = threading.Lock()
+    
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+    
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_pending:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many authentication requests, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            self._in_flight += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        # Cancelling the await only cancels a call still waiting for a thread
+        return await asyncio.wrap_future(future)
+    
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+    
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHasher()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -32,29 +85,68 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_token(token: str) -> dict:
+    """Decode a token, raising 401 if it is invalid or has no subject"""
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return email
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
+        payload = {}
+    if payload.get("sub") is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return payload
+
+def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return decode_token(credentials.credentials)["sub"]
+
+def get_token_subject(token: str) -> Optional[str]:
+    """Return the email a token was issued for, or None if the token is invalid"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db),
+    redis_client=Depends(get_redis)
+) -> Principal:
+    """Authenticate a request from the principal cache, loading the user only on a miss"""
+    token = credentials.credentials
+    principal = principal_cache.get_local(token)
+    if principal is None:
+        payload = decode_token(token)
+        email = payload["sub"]
+        principal = await principal_cache.get_shared(redis_client, email)
+        if principal is None:
+            user = await db.scalar(select(User).where(User.email == email))
+            if user is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="User not found"
+                )
+            principal = Principal.from_user(user)
+            await principal_cache.set_shared(redis_client, principal)
+        principal_cache.set_local(token, principal, payload.get("exp"))
+    
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user"
+        )
+    return principal
 
-def get_current_user(email: str = Depends(verify_token), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == email).first()
+async def get_current_user(principal: Principal = Depends(get_current_principal),
+                           db: AsyncSession = Depends(get_async_db)):
+    """The authenticated user as an ORM object, for routes that need more than the principal"""
+    user = await db.get(User, principal.id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
-    return user
\ No newline at end of file
+    return user
@@ -0,0 +1,14 @@
+import json
+from typing import Any
+
+# orjson is several times faster than the stdlib encoder; fall back when it is missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
@@ -0,0 +1,100 @@
+import asyncio
+import aiosmtplib
+from contextlib import asynccontextmanager
+from email.message import Message
+from typing import AsyncIterator, Iterable, List, Optional, Sequence, Tuple
+from app.core.config import settings
+
+class SMTPPool:
+    """Bounded pool of persistent, authenticated SMTP sessions"""
+    
+    def __init__(self, hostname: Optional[str] = None, port: Optional[int] = None,
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 size: Optional[int] = None, timeout: Optional[float] = None):
+        self.hostname = hostname or settings.SMTP_SERVER
+        self.port = port or settings.SMTP_PORT
+        self.username = settings.SMTP_USERNAME if username is None else username
+        self.password = settings.SMTP_PASSWORD if password is None else password
+        self.size = size or settings.SMTP_POOL_SIZE
+        self.timeout = timeout or settings.SMTP_TIMEOUT
+        # At most `size` sessions are in use; idle ones are reused most recently used first
+        self._slots = asyncio.Semaphore(self.size)
+        self._idle: List[aiosmtplib.SMTP] = []
+    
+    async def _connect(self) -> aiosmtplib.SMTP:
+        # Implicit TLS on 465, otherwise STARTTLS whenever the server offers it
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            timeout=self.timeout,
+            use_tls=self.port == 465,
+            start_tls=None
+        )
+        await smtp.connect()
+        if self.username:
+            await smtp.login(self.username, self.password)
+        return smtp
+    
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[aiosmtplib.SMTP]:
+        """Borrow a connected session, returning it to the pool unless it failed"""
+        async with self._slots:
+            smtp = None
+            while self._idle and smtp is None:
+                candidate = self._idle.pop()
+                if candidate.is_connected:
+                    smtp = candidate
+            if smtp is None:
+                smtp = await self._connect()
+            
+            try:
+                yield smtp
+            except BaseException:
+                smtp.close()
+                raise
+            self._idle.append(smtp)
+    
+    async def send(self, message: Message, recipients: Sequence[str]):
+        """Send one message to any number of recipients over a pooled session"""
+        await self.send_many([(message, recipients)])
+    
+    async def send_many(self, messages: Iterable[Tuple[Message, Sequence[str]]]):
+        """Send several messages back to back over a single pooled session"""
+        pending = list(messages)
+        # A pooled session may have been dropped by the server while idle, so retry once on a fresh one
+        for attempt in range(2):
+            try:
+                async with self.session() as smtp:
+                    while pending:
+                        message, recipients = pending[0]
+                        await smtp.send_message(message, sender=self.username, recipients=list(recipients))
+                        pending.pop(0)
+                return
+            except aiosmtplib.SMTPServerDisconnected:
+                if attempt:
+                    raise
+    
+    async def close(self):
+        """Quit every idle session"""
+        while self._idle:
+            smtp = self._idle.pop()
+            try:
+                await smtp.quit()
+            except Exception:
+                smtp.close()
+
+_pool: Optional[SMTPPool] = None
+
+def get_smtp_pool() -> SMTPPool:
+    """Get the shared SMTP pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        _pool = SMTPPool()
+    return _pool
+
+async def close_smtp_pool():
+    """Close the shared SMTP pool's sessions"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -1,26 +1,49 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
 import json
 import redis.asyncio as redis
-from app.core.database import engine, Base
+from sqlalchemy import select
+from app.core.database import SessionLocal, AsyncSessionLocal, async_engine
 from app.api import weather, alerts, auth, user_alerts
 from app.core.metrics import MetricsMiddleware, get_metrics
-from app.models import user  # Import user models to create tables
+from app.models.user import User, UserCity
+from app.core.security import get_token_subject, password_hasher
 from app.websocket.manager import ConnectionManager
+from app.websocket.subscriber import relay_alerts
 from app.core.config import settings
-
-# Create tables
-Base.metadata.create_all(bind=engine)
+from app.core.http_client import get_http_client, close_http_client
+from app.services.alert_bus import is_stream_id, read_since
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     app.state.redis = redis.from_url(settings.REDIS_URL)
+    app.state.http_client = get_http_client()
+    # Persist city coordinates in Redis and seed them from saved user cities
+    weather.weather_service.bind_redis(app.state.redis)
+    db = SessionLocal()
+    try:
+        await weather.weather_service.coordinates.seed_from_db(db)
+    finally:
+        db.close()
     app.state.connection_manager = ConnectionManager()
+    app.state.alert_relay = asyncio.create_task(
+        relay_alerts(app.state.redis, app.state.connection_manager)
+    )
     yield
     # Shutdown
+    app.state.alert_relay.cancel()
+    try:
+        await app.state.alert_relay
+    except asyncio.CancelledError:
+        pass
+    await close_http_client()
+    password_hasher.shutdown()
     await app.state.redis.close()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="Weather Monitoring API",
@@ -46,21 +69,65 @@ app.include_router(alerts.router, prefix="/api/alerts", tags=["alerts"])
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
 app.include_router(user_alerts.router, prefix="/api/user", tags=["user"])
 
+async def get_user_city_names(email: str):
+    """Cities saved by the user a token belongs to"""
+    async with AsyncSessionLocal() as db:
+        cities = await db.scalars(select(UserCity.city).join(User).where(User.email == email))
+        return cities.all()
+
+def is_string_list(value) -> bool:
+    """Subscribe filters must be omitted or a list of strings"""
+    return value is None or (isinstance(value, list) and all(isinstance(item, str) for item in value))
+
+async def replay_missed_alerts(manager: ConnectionManager, websocket: WebSocket, last_id: Optional[str]):
+    """Queue alerts from the stream after last_id, up to the newest one the client did not receive live"""
+    if not is_stream_id(last_id):
+        return
+    until = manager.hold_live(websocket)
+    alerts = []
+    try:
+        alerts = await read_since(app.state.redis, last_id, until=until)
+    finally:
+        manager.replay(websocket, alerts)
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await app.state.connection_manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = None, last_id: Optional[str] = None):
+    manager = app.state.connection_manager
+    await manager.connect(websocket)
+    
     try:
+        # Authenticated clients start out subscribed to their saved cities
+        email = get_token_subject(token) if token else None
+        if email:
+            cities = await get_user_city_names(email)
+            if cities:
+                manager.subscribe(websocket, cities=cities)
+        
+        # Reconnecting clients catch up from the stream_id of the last alert they saw
+        await replay_missed_alerts(manager, websocket, last_id)
+        
+        # Alerts are pushed by the shared relay task; clients may send
+        # {"action": "subscribe", "cities": [...], "alert_types": [...]} or
+        # {"action": "replay", "last_id": "..."}
         while True:
-            # Keep connection alive and listen for Redis messages
-            pubsub = app.state.redis.pubsub()
-            await pubsub.subscribe("weather_alerts")
-            
-            async for message in pubsub.listen():
-                if message["type"] == "message":
-                    alert_data = json.loads(message["data"])
-                    await app.state.connection_manager.broadcast(alert_data)
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            if not isinstance(message, dict):
+                continue
+            if message.get("action") == "subscribe":
+                cities, alert_types = message.get("cities"), message.get("alert_types")
+                # A malformed subscribe leaves the current subscription in place
+                if not (is_string_list(cities) and is_string_list(alert_types)):
+                    continue
+                manager.subscribe(websocket, cities=cities, alert_types=alert_types)
+            elif message.get("action") == "replay":
+                await replay_missed_alerts(manager, websocket, message.get("last_id"))
     except WebSocketDisconnect:
-        app.state.connection_manager.disconnect(websocket)
+        pass
+    finally:
+        manager.disconnect(websocket)
 
 @app.get("/")
 async def root():
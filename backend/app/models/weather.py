@@ -1,18 +1,60 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean, Index
+from sqlalchemy.sql import func, literal_column
 from app.core.database import Base
 
+def city_key(city):
+    """SQL form of normalize_city, matching ix_weather_readings_city_key_timestamp
+
+    The pattern arguments are inlined rather than bound so prepared statements
+    still match the index expression.
+    """
+    return func.lower(func.regexp_replace(
+        func.trim(city), literal_column(r"'\s+'"), literal_column("' '"), literal_column("'g'")
+    ))
+
 class WeatherReading(Base):
     __tablename__ = "weather_readings"
     
-    id = Column(Integer, primary_key=True, index=True)
+    # Range-partitioned by timestamp, so the partition key is part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     city = Column(String, index=True)
     temperature = Column(Float)
     humidity = Column(Float)
     pressure = Column(Float)
     aqi = Column(Integer, nullable=True)
     weather_condition = Column(String)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_weather_readings_city_timestamp", city, timestamp.desc()),
+        Index("ix_weather_readings_city_key_timestamp", city_key(city), timestamp.desc()),
+        Index("ix_weather_readings_timestamp", timestamp.desc()),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+class RollupColumns:
+    """Aggregated readings for one city over one time bucket"""
+    city = Column(String, primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    sample_count = Column(Integer)
+    temperature_min = Column(Float)
+    temperature_max = Column(Float)
+    temperature_avg = Column(Float)
+    humidity_min = Column(Float)
+    humidity_max = Column(Float)
+    humidity_avg = Column(Float)
+    pressure_min = Column(Float)
+    pressure_max = Column(Float)
+    pressure_avg = Column(Float)
+    aqi_min = Column(Float)
+    aqi_max = Column(Float)
+    aqi_avg = Column(Float)
+
+class WeatherReadingHourly(RollupColumns, Base):
+    __tablename__ = "weather_readings_hourly"
+
+class WeatherReadingDaily(RollupColumns, Base):
+    __tablename__ = "weather_readings_daily"
     
 class Alert(Base):
     __tablename__ = "alerts"
@@ -25,4 +67,9 @@ class Alert(Base):
     message = Column(String)
     is_resolved = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    resolved_at = Column(DateTime(timezone=True), nullable=True)
\ No newline at end of file
+    resolved_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_alerts_created_at_type_resolved", created_at, alert_type, is_resolved),
+        Index("ix_alerts_city_created_at", city, created_at.desc()),
+    )
\ No newline at end of file
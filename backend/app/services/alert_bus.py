@@ -0,0 +1,84 @@
+import json
+import os
+import re
+import socket
+import uuid
+from typing import Any, Dict, List, Optional
+from redis.exceptions import ResponseError
+from app.core.config import settings
+
+# Alerts are appended to a capped stream; each backend process reads it through its own consumer group
+ALERT_STREAM = "weather_alerts:stream"
+GROUP_PREFIX = "ws-"
+# Set with a TTL by every live relay, so groups left behind by crashed processes can be found
+GROUP_HEARTBEAT_PREFIX = "weather_alerts:relay:"
+GROUP_HEARTBEAT_TTL = 60
+ENTRY_FIELD = b"data"
+STREAM_ID_PATTERN = re.compile(r"^\d+(-\d+)?$")
+
+def is_stream_id(value: str) -> bool:
+    return bool(STREAM_ID_PATTERN.match(value or ""))
+
+def consumer_group() -> str:
+    """A group unique to this process, so every process fans out every alert to its own clients"""
+    return f"{GROUP_PREFIX}{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+def add_alerts(pipe, messages: List[bytes]):
+    """Queue XADDs for serialized alerts on a pipeline, trimming the stream to its bounded length"""
+    for message in messages:
+        pipe.xadd(ALERT_STREAM, {ENTRY_FIELD: message},
+                  maxlen=settings.ALERT_STREAM_MAXLEN, approximate=True)
+
+def decode_entry(entry_id, fields) -> Optional[Dict[str, Any]]:
+    """Alert payload of a stream entry with its stream_id added, or None if the entry was trimmed"""
+    data = (fields or {}).get(ENTRY_FIELD)
+    if data is None:
+        return None
+    alert = json.loads(data)
+    alert["stream_id"] = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+    return alert
+
+async def ensure_group(redis_client, group: str) -> Optional[str]:
+    """Create the consumer group at the stream's tail unless it already exists
+
+    Returns the id the new group starts after, or None if the group already existed.
+    """
+    # An explicit id instead of "$" tells the caller exactly which entries the group will skip
+    newest = await redis_client.xrevrange(ALERT_STREAM, count=1)
+    start = newest[0][0] if newest else "0-0"
+    start = start.decode() if isinstance(start, bytes) else start
+    try:
+        await redis_client.xgroup_create(ALERT_STREAM, group, id=start, mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+        return None
+    return start
+
+async def touch_group(redis_client, group: str):
+    await redis_client.set(GROUP_HEARTBEAT_PREFIX + group, 1, ex=GROUP_HEARTBEAT_TTL)
+
+async def destroy_group(redis_client, group: str):
+    """Remove a relay's group when its process stops"""
+    await redis_client.xgroup_destroy(ALERT_STREAM, group)
+    await redis_client.delete(GROUP_HEARTBEAT_PREFIX + group)
+
+async def prune_stale_groups(redis_client) -> List[str]:
+    """Destroy relay groups whose process stopped heartbeating without cleaning up"""
+    pruned = []
+    for info in await redis_client.xinfo_groups(ALERT_STREAM):
+        name = info["name"].decode() if isinstance(info["name"], bytes) else info["name"]
+        if name.startswith(GROUP_PREFIX) and not await redis_client.exists(GROUP_HEARTBEAT_PREFIX + name):
+            await redis_client.xgroup_destroy(ALERT_STREAM, name)
+            pruned.append(name)
+    return pruned
+
+async def read_since(redis_client, last_id: str, until: Optional[str] = None,
+                     limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Alerts published after last_id (exclusive) and up to until (inclusive), oldest first"""
+    entries = await redis_client.xrange(
+        ALERT_STREAM, min=f"({last_id}", max=until or "+",
+        count=limit or settings.ALERT_REPLAY_LIMIT
+    )
+    alerts = [decode_entry(entry_id, fields) for entry_id, fields in entries]
+    return [alert for alert in alerts if alert is not None]
@@ -0,0 +1,96 @@
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.cache import normalize_city
+from app.core.config import settings
+
+# Alert types tracked per city, each named after the reading field it checks
+TRACKED_ALERT_TYPES = ("temperature", "humidity", "aqi")
+
+class AlertStateTracker:
+    """Per (city, alert_type) alert state in a Redis hash, used to fire alerts only on
+    transition into breach and to auto-resolve them once values clear a hysteresis band
+    """
+    
+    REDIS_KEY = "alert_state"
+    
+    def __init__(self, cooldown: Optional[float] = None, hysteresis: Optional[Dict[str, float]] = None):
+        self.cooldown = settings.ALERT_COOLDOWN_SECONDS if cooldown is None else cooldown
+        self.hysteresis = hysteresis or {
+            "temperature": settings.TEMP_HYSTERESIS,
+            "humidity": settings.HUMIDITY_HYSTERESIS,
+            "aqi": settings.AQI_HYSTERESIS,
+        }
+    
+    @staticmethod
+    def key(city: str, alert_type: str) -> str:
+        return f"{normalize_city(city)}|{alert_type}"
+    
+    async def load(self, redis_client, readings: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Fetch the stored state for every (city, alert_type) in a cycle"""
+        keys = [self.key(reading["city"], alert_type)
+                for reading in readings for alert_type in TRACKED_ALERT_TYPES]
+        if not keys:
+            return {}
+        values = await redis_client.hmget(self.REDIS_KEY, keys)
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+    
+    def plan(self, readings: List[Dict[str, Any]], breach_rows: List[Dict[str, Any]],
+             states: Dict[str, Dict[str, Any]], now: Optional[float] = None
+             ) -> Tuple[List[Dict[str, Any]], List[int], Dict[str, Dict[str, Any]]]:
+        """Decide which breaches fire and which active alerts resolve
+
+        Returns the alert rows to insert, the ids of alerts to resolve and the
+        state updates to save once those writes are committed.
+        """
+        now = time.time() if now is None else now
+        breaches = {self.key(row["city"], row["alert_type"]): row for row in breach_rows}
+        fire_rows, resolve_ids, updates = [], [], {}
+        
+        for reading in readings:
+            for alert_type in TRACKED_ALERT_TYPES:
+                key = self.key(reading["city"], alert_type)
+                state = states.get(key, {})
+                row = breaches.get(key)
+                
+                if row is not None:
+                    above = row["actual_value"] > row["threshold_value"]
+                    if state.get("active") and state["above"] != above:
+                        # Crossed from the high to the low threshold (or back): the old alert
+                        # no longer describes the reading, so resolve it and fire the new one
+                        if state.get("alert_id") is not None:
+                            resolve_ids.append(state["alert_id"])
+                    elif state.get("active") or now - state.get("fired_at", 0) < self.cooldown:
+                        # Still in the breach that already fired, or fired too recently
+                        continue
+                    fire_rows.append(row)
+                    updates[key] = {
+                        "active": True,
+                        "alert_id": None,
+                        "threshold": row["threshold_value"],
+                        "above": above,
+                        "fired_at": now
+                    }
+                elif state.get("active"):
+                    value = reading.get(alert_type)
+                    if value is None:
+                        continue
+                    band = self.hysteresis[alert_type]
+                    if state["above"]:
+                        cleared = value <= state["threshold"] - band
+                    else:
+                        cleared = value >= state["threshold"] + band
+                    if cleared:
+                        if state.get("alert_id") is not None:
+                            resolve_ids.append(state["alert_id"])
+                        updates[key] = {**state, "active": False, "resolved_at": now}
+        
+        return fire_rows, resolve_ids, updates
+    
+    async def save(self, redis_client, updates: Dict[str, Dict[str, Any]]):
+        """Persist state updates after the cycle's writes are committed"""
+        if updates:
+            await redis_client.hset(
+                self.REDIS_KEY,
+                mapping={key: json.dumps(state) for key, state in updates.items()}
+            )
@@ -0,0 +1,57 @@
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.weather import Alert
+
+# Bumping the version orphans every cached result; old keys expire on their TTL
+VERSION_KEY = "alert_stats:version"
+KEY_PREFIX = "alert_stats:"
+
+# Always reported, even with no alerts in the window
+DEFAULT_ALERT_TYPES = ("temperature", "humidity", "aqi")
+
+async def compute_alert_stats(db: AsyncSession, hours: int) -> Dict[str, Any]:
+    """Count totals, resolved alerts and alerts per type in a single GROUP BY query"""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    
+    rows = await db.execute(
+        select(
+            Alert.alert_type,
+            func.count(),
+            func.count().filter(Alert.is_resolved == True)
+        ).where(Alert.created_at >= since).group_by(Alert.alert_type)
+    )
+    
+    by_type = {alert_type: 0 for alert_type in DEFAULT_ALERT_TYPES}
+    total_alerts = resolved_alerts = 0
+    for alert_type, count, resolved in rows:
+        by_type[alert_type] = count
+        total_alerts += count
+        resolved_alerts += resolved
+    
+    return {
+        "total_alerts": total_alerts,
+        "resolved_alerts": resolved_alerts,
+        "unresolved_alerts": total_alerts - resolved_alerts,
+        "by_type": by_type
+    }
+
+async def get_alert_stats(db: AsyncSession, redis_client, hours: int) -> Dict[str, Any]:
+    """Return alert statistics from Redis, computing and caching them on a miss"""
+    version = await redis_client.get(VERSION_KEY)
+    key = f"{KEY_PREFIX}{int(version or 0)}:{hours}"
+    
+    cached = await redis_client.get(key)
+    if cached is not None:
+        return json.loads(cached)
+    
+    stats = await compute_alert_stats(db, hours)
+    await redis_client.set(key, json.dumps(stats), ex=settings.ALERT_STATS_CACHE_TTL_SECONDS)
+    return stats
+
+async def invalidate_alert_stats(redis_client):
+    """Drop cached alert statistics after alerts are created or resolved"""
+    await redis_client.incr(VERSION_KEY)
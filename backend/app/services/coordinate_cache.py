@@ -0,0 +1,66 @@
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.cache import SingleFlight, normalize_city
+from app.models.user import UserCity
+
+Coordinates = Tuple[float, float]
+
+class CoordinateCache:
+    """Persistent city -> (lat, lon) cache backed by a Redis hash"""
+    
+    REDIS_KEY = "city_coordinates"
+    
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client
+        self._local: Dict[str, Coordinates] = {}
+        self._loads = SingleFlight()
+    
+    async def get(self, city: str) -> Optional[Coordinates]:
+        """Look up cached coordinates in memory, then in Redis"""
+        key = normalize_city(city)
+        coords = self._local.get(key)
+        if coords is not None or self.redis_client is None:
+            return coords
+        
+        value = await self.redis_client.hget(self.REDIS_KEY, key)
+        if value is None:
+            return None
+        lat, lon = (float(part) for part in value.decode().split(","))
+        self._local[key] = (lat, lon)
+        return lat, lon
+    
+    async def set(self, city: str, lat: float, lon: float):
+        """Store coordinates for a city"""
+        key = normalize_city(city)
+        self._local[key] = (lat, lon)
+        if self.redis_client is not None:
+            await self.redis_client.hset(self.REDIS_KEY, key, f"{lat},{lon}")
+    
+    async def get_or_load(self, city: str, loader: Callable[[], Awaitable[Coordinates]]) -> Coordinates:
+        """Return cached coordinates, coalescing concurrent loads for the same city"""
+        coords = await self.get(city)
+        if coords is not None:
+            return coords
+        
+        async def load() -> Coordinates:
+            lat, lon = await loader()
+            await self.set(city, lat, lon)
+            return lat, lon
+        
+        return await self._loads.do(normalize_city(city), load)
+    
+    async def seed_from_db(self, db: Session) -> int:
+        """Seed the cache from coordinates users saved with their cities"""
+        rows = db.query(UserCity.city, UserCity.latitude, UserCity.longitude).filter(
+            UserCity.latitude.isnot(None),
+            UserCity.longitude.isnot(None)
+        ).all()
+        
+        mapping = {normalize_city(city): (lat, lon) for city, lat, lon in rows}
+        self._local.update(mapping)
+        if mapping and self.redis_client is not None:
+            await self.redis_client.hset(
+                self.REDIS_KEY,
+                mapping={key: f"{lat},{lon}" for key, (lat, lon) in mapping.items()}
+            )
+        return len(mapping)
@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple, Type
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.weather import WeatherReading, WeatherReadingHourly, WeatherReadingDaily
+from app.services.retention import retention_cutoff
+
+# Supported aggregation buckets, smallest first
+BUCKETS = {
+    "5m": timedelta(minutes=5),
+    "15m": timedelta(minutes=15),
+    "1h": timedelta(hours=1),
+    "6h": timedelta(hours=6),
+    "1d": timedelta(days=1),
+    "7d": timedelta(days=7),
+}
+
+# date_bin aligns buckets to this origin
+BUCKET_ORIGIN = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+METRICS = ("temperature", "humidity", "pressure", "aqi")
+
+# Columns selected for raw history; rows are plain tuples in this order
+READING_FIELDS = ("id", "city", "temperature", "humidity", "pressure", "aqi", "weather_condition", "timestamp")
+READING_COLUMNS = [getattr(WeatherReading, field) for field in READING_FIELDS]
+
+def choose_bucket(requested: str, span: timedelta) -> str:
+    """Widen the requested bucket until the span fits in HISTORY_MAX_BUCKETS buckets"""
+    names = list(BUCKETS)
+    index = names.index(requested)
+    while index < len(names) - 1 and span / BUCKETS[names[index]] > settings.HISTORY_MAX_BUCKETS:
+        index += 1
+    return names[index]
+
+def align_up(moment: datetime, interval: timedelta) -> datetime:
+    """Round moment up to the next date_bin bucket boundary for interval"""
+    remainder = (moment - BUCKET_ORIGIN) % interval
+    return moment + (interval - remainder) if remainder else moment
+
+async def get_latest(db: AsyncSession, limit: int) -> List[Tuple]:
+    """Newest readings across all cities as READING_FIELDS tuples"""
+    result = await db.execute(
+        select(*READING_COLUMNS).order_by(desc(WeatherReading.timestamp)).limit(limit)
+    )
+    return [tuple(row) for row in result]
+
+async def get_history(db: AsyncSession, city: str, since: datetime, limit: int) -> List[Tuple]:
+    """Newest-first READING_FIELDS tuples for a city, falling back to rollups past raw retention"""
+    raw_cutoff = retention_cutoff()
+    result = await db.execute(select(*READING_COLUMNS).where(
+        WeatherReading.city == city,
+        WeatherReading.timestamp >= max(since, raw_cutoff)
+    ).order_by(desc(WeatherReading.timestamp)).limit(limit))
+    rows = [tuple(row) for row in result]
+    
+    if since >= raw_cutoff or len(rows) >= limit:
+        return rows
+    
+    # Hourly rollups cover the span just before raw retention, daily rollups the rest
+    hourly_cutoff = datetime.now(timezone.utc) - timedelta(days=settings.ROLLUP_HOURLY_RETENTION_DAYS)
+    rows.extend(await _rollup_rows(
+        db, WeatherReadingHourly, city, max(since, hourly_cutoff), raw_cutoff, limit - len(rows)
+    ))
+    if since < hourly_cutoff and len(rows) < limit:
+        rows.extend(await _rollup_rows(
+            db, WeatherReadingDaily, city, since, hourly_cutoff, limit - len(rows)
+        ))
+    return rows
+
+async def _rollup_rows(db: AsyncSession, model: Type, city: str, start: datetime,
+                       end: datetime, limit: int) -> List[Tuple]:
+    result = await db.execute(select(
+        model.city, model.temperature_avg, model.humidity_avg, model.pressure_avg,
+        model.aqi_avg, model.bucket_start
+    ).where(
+        model.city == city,
+        model.bucket_start >= start,
+        model.bucket_start < end
+    ).order_by(desc(model.bucket_start)).limit(limit))
+    
+    # Rollups have no id or condition; averages stand in for the reading values
+    return [
+        (None, city, temperature, humidity, pressure,
+         round(aqi) if aqi is not None else None, None, bucket_start)
+        for city, temperature, humidity, pressure, aqi, bucket_start in result
+    ]
+
+async def get_bucketed_history(db: AsyncSession, cities: List[str], since: datetime,
+                               bucket: str) -> List[Dict[str, Any]]:
+    """Min/max/avg per city and time bucket, aggregated in the database"""
+    now = datetime.now(timezone.utc)
+    bucket = choose_bucket(bucket, now - since)
+    interval = BUCKETS[bucket]
+    daily_interval = max(interval, timedelta(days=1))
+    hourly_interval = max(interval, timedelta(hours=1))
+    
+    # Tier boundaries are rounded up to a bucket edge so no (city, bucket_start) spans two tiers;
+    # the older tier still has data up to the rounded boundary
+    raw_cutoff = align_up(retention_cutoff(now), hourly_interval)
+    hourly_cutoff = align_up(now - timedelta(days=settings.ROLLUP_HOURLY_RETENTION_DAYS), daily_interval)
+    
+    rows = []
+    if since < hourly_cutoff:
+        rows += await _aggregate_rollups(db, WeatherReadingDaily, cities, since, hourly_cutoff,
+                                         daily_interval)
+    if since < raw_cutoff:
+        rows += await _aggregate_rollups(db, WeatherReadingHourly, cities, max(since, hourly_cutoff),
+                                         raw_cutoff, hourly_interval)
+    rows += await _aggregate_raw(db, cities, max(since, raw_cutoff), interval)
+    
+    rows.sort(key=lambda row: (row["city"], row["bucket_start"]))
+    return rows
+
+async def _aggregate_raw(db: AsyncSession, cities: List[str], start: datetime,
+                         interval: timedelta) -> List[Dict[str, Any]]:
+    bucket_start = func.date_bin(interval, WeatherReading.timestamp, BUCKET_ORIGIN).label("bucket_start")
+    aggregates = []
+    for metric in METRICS:
+        column = getattr(WeatherReading, metric)
+        aggregates += [
+            func.min(column).label(f"{metric}_min"),
+            func.max(column).label(f"{metric}_max"),
+            func.avg(column).label(f"{metric}_avg"),
+        ]
+    
+    result = await db.execute(
+        select(WeatherReading.city, bucket_start, func.count().label("sample_count"), *aggregates)
+        .where(WeatherReading.city.in_(cities), WeatherReading.timestamp >= start)
+        .group_by(WeatherReading.city, bucket_start)
+    )
+    return [dict(row) for row in result.mappings()]
+
+async def _aggregate_rollups(db: AsyncSession, model: Type, cities: List[str], start: datetime,
+                             end: datetime, interval: timedelta) -> List[Dict[str, Any]]:
+    bucket_start = func.date_bin(interval, model.bucket_start, BUCKET_ORIGIN).label("bucket_start")
+    sample_count = func.sum(model.sample_count)
+    aggregates = []
+    for metric in METRICS:
+        aggregates += [
+            func.min(getattr(model, f"{metric}_min")).label(f"{metric}_min"),
+            func.max(getattr(model, f"{metric}_max")).label(f"{metric}_max"),
+            # Averages of rollups are weighted by how many readings each one covers
+            (func.sum(getattr(model, f"{metric}_avg") * model.sample_count) / sample_count).label(f"{metric}_avg"),
+        ]
+    
+    result = await db.execute(
+        select(model.city, bucket_start, sample_count.label("sample_count"), *aggregates)
+        .where(model.city.in_(cities), model.bucket_start >= start, model.bucket_start < end)
+        .group_by(model.city, bucket_start)
+    )
+    return [dict(row) for row in result.mappings()]
@@ -0,0 +1,201 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.core.metrics import record_notification, record_notification_lag, update_notification_queue_depth
+from app.services.notification_service import NotificationService
+
+@dataclass
+class Notification:
+    """One message for one recipient on a channel ("email" or "sms"), or one email
+    for every address in `recipients`
+    """
+    channel: str
+    recipient: str
+    subject: str
+    message: str
+    recipients: List[str] = field(default_factory=list)
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+    
+    @classmethod
+    def email_batch(cls, recipients: List[str], subject: str, message: str) -> "Notification":
+        return cls("email", f"{len(recipients)} recipients", subject, message, recipients=list(recipients))
+
+class TokenBucket:
+    """Allows `rate` sends per second on average, with bursts up to `capacity`"""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        # Waiters take tokens one at a time, in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class NotificationDispatcher:
+    """Queue-backed notification delivery with a bounded worker pool
+
+    Notifications for the same recipient and channel within the digest window are
+    coalesced into one message. Each channel has its own token-bucket rate limit,
+    and failed sends are retried with exponential backoff.
+    """
+    
+    def __init__(self, notification_service: Optional[NotificationService] = None,
+                 workers: Optional[int] = None, queue_size: Optional[int] = None,
+                 digest_window: Optional[float] = None, max_retries: Optional[int] = None,
+                 retry_base_delay: Optional[float] = None, rate_limits: Optional[Dict[str, float]] = None):
+        self.notification_service = notification_service or NotificationService()
+        self.workers = workers or settings.NOTIFY_WORKERS
+        self.digest_window = settings.NOTIFY_DIGEST_WINDOW if digest_window is None else digest_window
+        self.max_retries = settings.NOTIFY_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_base_delay = retry_base_delay or settings.NOTIFY_RETRY_BASE_DELAY
+        rate_limits = rate_limits or {"email": settings.NOTIFY_EMAIL_RATE, "sms": settings.NOTIFY_SMS_RATE}
+        self.buckets = {channel: TokenBucket(rate) for channel, rate in rate_limits.items()}
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.NOTIFY_QUEUE_SIZE)
+        self._digests: Dict[Tuple[str, str], List[Notification]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        # Failed notifications waiting out their backoff, by the task that will requeue them
+        self._retries: Dict[asyncio.Task, Notification] = {}
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+    
+    def start(self):
+        """Start the worker pool"""
+        if not self._workers:
+            self._stopping = False
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+    
+    async def stop(self, timeout: float = 30.0):
+        """Flush pending digests and retries, give queued notifications time to send, then stop the workers
+
+        Retries still in backoff get one last attempt now; anything that fails
+        again or is still queued at the timeout is counted as failed.
+        """
+        self._stopping = True
+        for key in list(self._digests):
+            await self._flush(key)
+        for task, notification in list(self._retries.items()):
+            if task.cancel():
+                await self._enqueue(notification)
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"Stopping notification workers with {self.queue.qsize()} notifications unsent")
+            while not self.queue.empty():
+                record_notification(self.queue.get_nowait().channel, "failed")
+                self.queue.task_done()
+        for task in self._workers + list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._tasks, return_exceptions=True)
+        self._workers = []
+    
+    async def submit(self, notification: Notification):
+        """Queue a notification, holding it for the digest window to coalesce with others"""
+        # A batch already is one message for many users, so it is not held for a digest
+        if self.digest_window <= 0 or notification.recipients:
+            await self._enqueue(notification)
+            return
+        
+        key = (notification.channel, notification.recipient)
+        pending = self._digests.setdefault(key, [])
+        pending.append(notification)
+        if len(pending) == 1:
+            self._spawn(self._flush_later(key))
+    
+    async def _flush_later(self, key: Tuple[str, str]):
+        await asyncio.sleep(self.digest_window)
+        await self._flush(key)
+    
+    async def _flush(self, key: Tuple[str, str]):
+        pending = self._digests.pop(key, None)
+        if not pending:
+            return
+        if len(pending) == 1:
+            await self._enqueue(pending[0])
+            return
+        
+        channel, recipient = key
+        separator = "<br>" if channel == "email" else "; "
+        await self._enqueue(Notification(
+            channel=channel,
+            recipient=recipient,
+            subject=f"{len(pending)} weather alerts",
+            message=separator.join(notification.message for notification in pending)
+        ))
+    
+    async def _enqueue(self, notification: Notification):
+        notification.enqueued_at = time.monotonic()
+        # Waits when the queue is full, pushing back on producers
+        await self.queue.put(notification)
+        update_notification_queue_depth(self.queue.qsize())
+    
+    async def _retry_later(self, notification: Notification, delay: float):
+        await asyncio.sleep(delay)
+        await self._enqueue(notification)
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+    
+    async def _work(self):
+        while True:
+            notification = await self.queue.get()
+            try:
+                update_notification_queue_depth(self.queue.qsize())
+                record_notification_lag(notification.channel, time.monotonic() - notification.enqueued_at)
+                await self._deliver(notification)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                record_notification(notification.channel, "failed")
+                print(f"Error delivering {notification.channel} to {notification.recipient}: {str(e)}")
+            finally:
+                self.queue.task_done()
+    
+    async def _deliver(self, notification: Notification):
+        bucket = self.buckets.get(notification.channel)
+        if bucket is not None:
+            await bucket.acquire()
+        
+        if await self._send(notification):
+            record_notification(notification.channel, "sent")
+            return
+        
+        notification.attempts += 1
+        if notification.attempts > self.max_retries or self._stopping:
+            record_notification(notification.channel, "failed")
+            print(f"Giving up on {notification.channel} to {notification.recipient} "
+                  f"after {notification.attempts} attempts")
+            return
+        record_notification(notification.channel, "retried")
+        task = self._spawn(self._retry_later(notification, self.retry_base_delay * 2 ** (notification.attempts - 1)))
+        self._retries[task] = notification
+        task.add_done_callback(lambda done: self._retries.pop(done, None))
+    
+    async def _send(self, notification: Notification) -> bool:
+        if notification.channel == "email" and notification.recipients:
+            return await self.notification_service.send_email_batch(
+                notification.recipients, notification.subject, notification.message
+            )
+        if notification.channel == "email":
+            return await self.notification_service.send_email_alert(
+                notification.recipient, notification.subject, notification.message
+            )
+        if notification.channel == "sms":
+            return await self.notification_service.send_sms_alert(notification.recipient, notification.message)
+        raise ValueError(f"Unknown notification channel: {notification.channel}")
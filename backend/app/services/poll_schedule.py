@@ -0,0 +1,131 @@
+import heapq
+import math
+import random
+import statistics
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.core.cache import normalize_city
+from app.core.config import settings
+from app.models.user import UserCity
+
+# Distance from a threshold, per reading field, below which a city is polled faster
+PROXIMITY_SCALES = {"temperature": 5.0, "humidity": 10.0, "aqi": 25.0}
+# Temperature standard deviation (°C) over recent readings that halves the interval
+VOLATILITY_SCALE = 2.0
+HISTORY_SIZE = 6
+
+def city_subscriber_counts(db: Session) -> Dict[str, int]:
+    """Number of users who saved each city, keyed by normalized name"""
+    counts: Dict[str, int] = {}
+    for city, count in db.execute(select(UserCity.city, func.count()).group_by(UserCity.city)):
+        if city:
+            key = normalize_city(city)
+            counts[key] = counts.get(key, 0) + count
+    return counts
+
+def global_thresholds() -> List[Tuple[str, float]]:
+    return [
+        ("temperature", settings.TEMP_HIGH_THRESHOLD),
+        ("temperature", settings.TEMP_LOW_THRESHOLD),
+        ("humidity", settings.HUMIDITY_HIGH_THRESHOLD),
+        ("aqi", settings.AQI_HIGH_THRESHOLD),
+    ]
+
+class AdaptivePollSchedule:
+    """Heap of cities keyed by next-due time, each polled at its own adaptive interval
+
+    Watched cities, volatile weather and values close to a threshold shorten a city's
+    interval; quiet, unwatched cities are polled less often. New cities are spread
+    across the base interval and every interval is jittered, so fetches stay evenly
+    paced instead of arriving in bursts.
+    """
+    
+    def __init__(self, base_interval: Optional[float] = None, min_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None):
+        self.base_interval = base_interval or settings.SCHEDULER_BASE_INTERVAL
+        self.min_interval = min_interval or settings.SCHEDULER_MIN_INTERVAL
+        self.max_interval = max_interval or settings.SCHEDULER_MAX_INTERVAL
+        self._heap: List[Tuple[float, str]] = []
+        # Current due time per scheduled city; heap entries that disagree are stale
+        self._due: Dict[str, float] = {}
+        self._history: Dict[str, Deque[float]] = {}
+        self._assigned: Set[str] = set()
+        # Consecutive failed fetches per city, for backing off unknown or failing cities
+        self._failures: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self._assigned)
+    
+    def sync(self, cities: Iterable[str], now: float):
+        """Schedule newly assigned cities, spread over the base interval, and drop the rest"""
+        cities = list(cities)
+        new_cities = [city for city in cities if city not in self._assigned]
+        self._assigned = set(cities)
+        for city in [city for city in self._due if city not in self._assigned]:
+            del self._due[city]
+        for city in [city for city in self._history if city not in self._assigned]:
+            del self._history[city]
+        for city in [city for city in self._failures if city not in self._assigned]:
+            del self._failures[city]
+        
+        spacing = self.base_interval / len(new_cities) if new_cities else 0
+        for position, city in enumerate(new_cities):
+            self._push(city, now + position * spacing)
+    
+    def pop_due(self, now: float) -> List[str]:
+        """Remove and return every city due at or before now"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, city = heapq.heappop(self._heap)
+            if self._due.get(city) == due_at:
+                del self._due[city]
+                due.append(city)
+        return due
+    
+    def next_due(self) -> Optional[float]:
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+    
+    def interval(self, city: str, reading: Optional[dict], subscribers: int,
+                 thresholds: List[Tuple[str, float]]) -> float:
+        """Seconds until a city should be polled again"""
+        # Unwatched cities run at twice the base interval, watched ones faster with more users
+        interval = self.base_interval * 2 / (1 + math.log2(1 + subscribers))
+        
+        history = self._history.get(city)
+        if history and len(history) > 1:
+            interval /= 1 + statistics.pstdev(history) / VOLATILITY_SCALE
+        
+        if reading:
+            distances = [
+                abs(reading[field] - threshold) / PROXIMITY_SCALES[field]
+                for field, threshold in thresholds
+                if reading.get(field) is not None
+            ]
+            if distances and min(distances) < 1:
+                interval *= max(min(distances), 0.25)
+        
+        return min(max(interval, self.min_interval), self.max_interval)
+    
+    def record(self, city: str, reading: Optional[dict], subscribers: int,
+               thresholds: List[Tuple[str, float]], now: float) -> float:
+        """Reschedule a polled city from its latest reading, backing off exponentially after failures"""
+        if city not in self._assigned:
+            return 0.0
+        if reading is None:
+            failures = self._failures.get(city, 0) + 1
+            self._failures[city] = failures
+            interval = min(self.min_interval * 2 ** (failures - 1), self.max_interval)
+        else:
+            self._failures.pop(city, None)
+            self._history.setdefault(city, deque(maxlen=HISTORY_SIZE)).append(reading["temperature"])
+            interval = self.interval(city, reading, subscribers, thresholds)
+        self._push(city, now + interval * random.uniform(0.9, 1.1))
+        return interval
+    
+    def _push(self, city: str, due_at: float):
+        self._due[city] = due_at
+        heapq.heappush(self._heap, (due_at, city))
@@ -0,0 +1,124 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional, Type
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.weather import WeatherReading, WeatherReadingHourly, WeatherReadingDaily
+
+READINGS_TABLE = WeatherReading.__tablename__
+PARTITION_PREFIX = f"{READINGS_TABLE}_p"
+DEFAULT_PARTITION = f"{READINGS_TABLE}_default"
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+def retention_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Start of the oldest day still kept in the raw readings table"""
+    now = now or datetime.now(timezone.utc)
+    oldest_day = now.date() - timedelta(days=settings.READINGS_RETENTION_DAYS)
+    return datetime.combine(oldest_day, time.min, tzinfo=timezone.utc)
+
+def ensure_partitions(db: Session, days_ahead: Optional[int] = None) -> List[str]:
+    """Create daily partitions from today through days_ahead, plus a default catch-all"""
+    days_ahead = settings.READINGS_PARTITION_PRECREATE_DAYS if days_ahead is None else days_ahead
+    today = datetime.now(timezone.utc).date()
+    created = []
+    
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {READINGS_TABLE} DEFAULT"))
+    for offset in range(days_ahead + 1):
+        day = today + timedelta(days=offset)
+        name = partition_name(day)
+        if _table_exists(db, name):
+            continue
+        _create_partition(db, name, day)
+        created.append(name)
+    db.commit()
+    return created
+
+def _create_partition(db: Session, name: str, day: date):
+    # Readings for the day may already sit in the default partition (maintenance fell
+    # behind), and Postgres refuses a partition whose rows are in the default. Build
+    # the table standalone, move those rows into it, then attach it.
+    start, end = day.isoformat(), (day + timedelta(days=1)).isoformat()
+    db.execute(text(f"CREATE TABLE {name} (LIKE {READINGS_TABLE} INCLUDING DEFAULTS)"))
+    db.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE timestamp >= '{start}' AND timestamp < '{end}' RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ))
+    db.execute(text(
+        f"ALTER TABLE {READINGS_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"
+    ))
+
+def drop_expired_partitions(db: Session) -> List[str]:
+    """Drop whole daily partitions older than the retention window, and expired default-partition rows"""
+    cutoff = retention_cutoff().date()
+    dropped = []
+    
+    # Readings that landed in the default partition are not covered by a daily one
+    if _table_exists(db, DEFAULT_PARTITION):
+        db.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff"),
+                   {"cutoff": retention_cutoff()})
+    
+    rows = db.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+        "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+        "WHERE parent.relname = :parent"
+    ), {"parent": READINGS_TABLE}).scalars().all()
+    
+    for name in rows:
+        if not name.startswith(PARTITION_PREFIX):
+            continue
+        day = datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()
+        if day < cutoff:
+            db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    db.commit()
+    return dropped
+
+def roll_up(db: Session, lookback_hours: Optional[int] = None):
+    """Aggregate recent raw readings into the hourly and daily rollup tables"""
+    lookback_hours = lookback_hours or settings.ROLLUP_LOOKBACK_HOURS
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(hours=lookback_hours)
+    
+    # Re-aggregating the lookback window keeps buckets correct if a run was missed
+    _roll_up_into(db, WeatherReadingHourly, "hour", since.replace(minute=0, second=0, microsecond=0))
+    _roll_up_into(db, WeatherReadingDaily, "day", datetime.combine(since.date(), time.min, tzinfo=timezone.utc))
+    
+    # Hourly rollups have their own, longer retention; daily rollups are kept
+    db.execute(
+        text(f"DELETE FROM {WeatherReadingHourly.__tablename__} WHERE bucket_start < :cutoff"),
+        {"cutoff": now - timedelta(days=settings.ROLLUP_HOURLY_RETENTION_DAYS)}
+    )
+    db.commit()
+
+def run_maintenance(db: Session):
+    """Create upcoming partitions, refresh rollups, then drop expired raw data"""
+    ensure_partitions(db)
+    roll_up(db)
+    drop_expired_partitions(db)
+
+def _roll_up_into(db: Session, model: Type, unit: str, since: datetime):
+    metrics = ("temperature", "humidity", "pressure", "aqi")
+    aggregates = ", ".join(
+        f"min({metric}), max({metric}), avg({metric})" for metric in metrics
+    )
+    columns = ", ".join(
+        f"{metric}_min, {metric}_max, {metric}_avg" for metric in metrics
+    )
+    updates = ", ".join(
+        f"{column} = EXCLUDED.{column}"
+        for column in ["sample_count"] + [c.strip() for c in columns.split(",")]
+    )
+    db.execute(text(
+        f"INSERT INTO {model.__tablename__} (city, bucket_start, sample_count, {columns}) "
+        f"SELECT city, date_trunc('{unit}', timestamp, 'UTC') AS bucket, count(*), {aggregates} "
+        f"FROM {READINGS_TABLE} WHERE timestamp >= :since "
+        f"GROUP BY city, bucket "
+        f"ON CONFLICT (city, bucket_start) DO UPDATE SET {updates}"
+    ), {"since": since})
+
+def _table_exists(db: Session, name: str) -> bool:
+    return db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
@@ -0,0 +1,200 @@
+import asyncio
+import json
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Tuple
+from sqlalchemy.orm import Session
+from app.core.cache import normalize_city
+from app.models.user import CustomAlert, User
+
+RULE_CHANGES_CHANNEL = "custom_alert_changes"
+# Ids of custom alerts currently in breach, so users are notified once per breach
+TRIGGERED_RULES_KEY = "custom_alerts:triggered"
+
+# Custom alert type -> (reading field, True if the rule fires above the threshold)
+ALERT_TYPE_METRICS = {
+    "temperature_high": ("temperature", True),
+    "temperature_low": ("temperature", False),
+    "humidity": ("humidity", True),
+    "aqi": ("aqi", True),
+}
+
+@dataclass(frozen=True)
+class Rule:
+    """The parts of a CustomAlert needed to evaluate and notify on it"""
+    id: int
+    user_id: int
+    email: str
+    city: str
+    alert_type: str
+    threshold_value: float
+    email_enabled: bool
+    sms_enabled: bool
+
+    @classmethod
+    def from_custom_alert(cls, alert: CustomAlert, email: str) -> "Rule":
+        return cls(
+            id=alert.id,
+            user_id=alert.user_id,
+            email=email,
+            city=alert.city,
+            alert_type=alert.alert_type,
+            threshold_value=alert.threshold_value,
+            email_enabled=alert.email_enabled,
+            sms_enabled=alert.sms_enabled
+        )
+
+class CustomAlertIndex:
+    """In-memory index of active custom alerts, keyed by city and alert type
+
+    Each key holds (threshold, rule id) pairs sorted by threshold, so the rules
+    a reading triggers are found with one binary search instead of a scan.
+    """
+    
+    def __init__(self):
+        self._rules: Dict[int, Rule] = {}
+        self._thresholds: Dict[Tuple[str, str], List[Tuple[float, int]]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._rules)
+    
+    def load(self, db: Session) -> int:
+        """Rebuild the index from every active custom alert"""
+        rows = db.query(CustomAlert, User.email).join(User).filter(
+            CustomAlert.is_active == True,
+            User.is_active == True
+        ).all()
+        
+        self._rules = {}
+        self._thresholds = {}
+        for alert, email in rows:
+            rule = Rule.from_custom_alert(alert, email)
+            if rule.alert_type not in ALERT_TYPE_METRICS:
+                continue
+            self._rules[rule.id] = rule
+            self._thresholds.setdefault(self._key(rule), []).append((rule.threshold_value, rule.id))
+        for entries in self._thresholds.values():
+            entries.sort()
+        return len(self._rules)
+    
+    def upsert(self, rule: Rule):
+        """Add a rule or replace the indexed version of it"""
+        self.remove(rule.id)
+        if rule.alert_type not in ALERT_TYPE_METRICS:
+            return
+        self._rules[rule.id] = rule
+        insort(self._thresholds.setdefault(self._key(rule), []), (rule.threshold_value, rule.id))
+    
+    def remove(self, rule_id: int):
+        """Drop a rule from the index if present"""
+        rule = self._rules.pop(rule_id, None)
+        if rule is None:
+            return
+        key = self._key(rule)
+        entries = self._thresholds[key]
+        entries.pop(bisect_left(entries, (rule.threshold_value, rule.id)))
+        if not entries:
+            del self._thresholds[key]
+    
+    def match(self, reading: Dict[str, Any]) -> List[Tuple[Rule, float]]:
+        """Rules triggered by a reading, with the value that triggered them"""
+        city = normalize_city(reading["city"])
+        matches = []
+        for alert_type, (field, above) in ALERT_TYPE_METRICS.items():
+            value = reading.get(field)
+            entries = self._thresholds.get((city, alert_type))
+            if value is None or not entries:
+                continue
+            if above:
+                # Thresholds strictly below the value
+                triggered = entries[:bisect_left(entries, (value,))]
+            else:
+                # Thresholds strictly above the value
+                triggered = entries[bisect_right(entries, (value, float("inf"))):]
+            matches.extend((self._rules[rule_id], value) for _, rule_id in triggered)
+        return matches
+    
+    def rule_ids(self, city: str) -> List[int]:
+        """Ids of every rule on a city"""
+        city = normalize_city(city)
+        return [
+            rule_id
+            for alert_type in ALERT_TYPE_METRICS
+            for _, rule_id in self._thresholds.get((city, alert_type), ())
+        ]
+    
+    def thresholds(self, city: str) -> List[Tuple[str, float]]:
+        """(reading field, threshold) for every rule on a city"""
+        city = normalize_city(city)
+        return [
+            (field, threshold)
+            for alert_type, (field, _) in ALERT_TYPE_METRICS.items()
+            for threshold, _ in self._thresholds.get((city, alert_type), ())
+        ]
+    
+    def apply_change(self, change: Dict[str, Any]):
+        """Apply a change event published by publish_rule_change"""
+        if change["op"] == "upsert":
+            self.upsert(Rule(**change["rule"]))
+        elif change["op"] == "delete":
+            self.remove(change["id"])
+    
+    @staticmethod
+    def _key(rule: Rule) -> Tuple[str, str]:
+        return normalize_city(rule.city), rule.alert_type
+
+async def publish_rule_change(redis_client, alert: CustomAlert, email: str, deleted: bool = False):
+    """Tell every process holding an index that a custom alert changed"""
+    if deleted or not alert.is_active:
+        change = {"op": "delete", "id": alert.id}
+    else:
+        change = {"op": "upsert", "rule": asdict(Rule.from_custom_alert(alert, email))}
+    async with redis_client.pipeline(transaction=False) as pipe:
+        # An edited rule is re-armed, and a deleted one forgotten
+        pipe.srem(TRIGGERED_RULES_KEY, alert.id)
+        pipe.publish(RULE_CHANGES_CHANNEL, json.dumps(change))
+        await pipe.execute()
+
+async def new_breaches(redis_client, index: CustomAlertIndex, readings: List[Dict[str, Any]],
+                       matches: List[Tuple[Rule, float]]) -> List[Tuple[Rule, float]]:
+    """Matches for rules that were not already in breach, recording which rules are in breach now
+
+    Rules on the polled cities that no longer match are cleared, so they notify again
+    the next time their threshold is crossed.
+    """
+    matched_ids = [rule.id for rule, _ in matches]
+    cleared = {rule_id for reading in readings for rule_id in index.rule_ids(reading["city"])}
+    cleared.difference_update(matched_ids)
+    
+    already = [False] * len(matches)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        if matched_ids:
+            pipe.smismember(TRIGGERED_RULES_KEY, matched_ids)
+            pipe.sadd(TRIGGERED_RULES_KEY, *matched_ids)
+        if cleared:
+            pipe.srem(TRIGGERED_RULES_KEY, *cleared)
+        results = await pipe.execute()
+    if matched_ids:
+        already = results[0]
+    return [match for match, triggered in zip(matches, already) if not triggered]
+
+async def follow_rule_changes(redis_client, index: CustomAlertIndex, retry_delay: float = 1.0,
+                              on_resubscribe=None):
+    """Keep an index up to date with published rule changes"""
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(RULE_CHANGES_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    index.apply_change(json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Rule change subscription failed, retrying in {retry_delay}s: {str(e)}")
+            await asyncio.sleep(retry_delay)
+            # Changes published while disconnected were missed
+            if on_resubscribe is not None:
+                on_resubscribe()
+        finally:
+            await pubsub.close()
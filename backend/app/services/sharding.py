@@ -0,0 +1,73 @@
+import hashlib
+import os
+import socket
+import time
+from typing import Iterable, List, Optional
+from sqlalchemy import distinct, select
+from sqlalchemy.orm import Session
+from app.core.cache import normalize_city
+from app.core.config import settings
+from app.models.user import CustomAlert, User, UserCity
+
+# Scheduler workers alive within the heartbeat TTL, scored by their last heartbeat
+WORKERS_KEY = "scheduler:workers"
+
+def load_cities(db: Session, defaults: Iterable[str]) -> List[str]:
+    """Default cities plus every city a user has saved or has an active custom alert on,
+    without case or spacing duplicates
+    """
+    # A custom alert may name a city its owner never saved; it can only fire if that city is polled
+    rule_cities = db.scalars(select(distinct(CustomAlert.city)).join(User).where(
+        CustomAlert.is_active == True,
+        User.is_active == True
+    ))
+    cities = {}
+    for city in list(defaults) + list(db.scalars(select(distinct(UserCity.city)))) + list(rule_cities):
+        if city and city.strip():
+            cities.setdefault(normalize_city(city), city.strip())
+    return list(cities.values())
+
+def default_worker_id() -> str:
+    return settings.SCHEDULER_WORKER_ID or f"{socket.gethostname()}:{os.getpid()}"
+
+def _weight(worker_id: str, key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{worker_id}|{key}".encode(), digest_size=8).digest(), "big")
+
+def owner(key: str, workers: List[str]) -> Optional[str]:
+    """Rendezvous hashing: the worker with the highest weight for a key owns it
+
+    When a worker joins or leaves, only the keys it gains or loses move.
+    """
+    return max(workers, key=lambda worker_id: _weight(worker_id, key)) if workers else None
+
+class ShardCoordinator:
+    """Splits work between scheduler workers that heartbeat into a Redis sorted set"""
+    
+    def __init__(self, redis_client=None, worker_id: Optional[str] = None, heartbeat_ttl: Optional[float] = None):
+        self.redis_client = redis_client
+        self.worker_id = worker_id or default_worker_id()
+        self.heartbeat_ttl = heartbeat_ttl or settings.SCHEDULER_HEARTBEAT_TTL
+        self.workers: List[str] = [self.worker_id]
+    
+    async def heartbeat(self) -> List[str]:
+        """Record this worker as alive, expire silent ones and refresh the membership"""
+        now = time.time()
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.zadd(WORKERS_KEY, {self.worker_id: now})
+            pipe.zremrangebyscore(WORKERS_KEY, "-inf", now - self.heartbeat_ttl)
+            pipe.zrange(WORKERS_KEY, 0, -1)
+            _, _, members = await pipe.execute()
+        workers = sorted(member.decode() if isinstance(member, bytes) else member for member in members)
+        self.workers = workers or [self.worker_id]
+        return self.workers
+    
+    async def leave(self):
+        """Drop out of the membership so other workers take over right away"""
+        await self.redis_client.zrem(WORKERS_KEY, self.worker_id)
+    
+    def owns(self, key: str) -> bool:
+        return owner(normalize_city(key), self.workers) == self.worker_id
+    
+    def shard(self, cities: Iterable[str]) -> List[str]:
+        """The cities this worker is responsible for"""
+        return [city for city in cities if self.owns(city)]
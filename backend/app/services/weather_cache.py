@@ -0,0 +1,73 @@
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import SingleFlight, normalize_city
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import record_weather_cache
+from app.models.weather import WeatherReading, city_key
+from app.services.weather_service import WeatherService
+
+class WeatherCache:
+    """Read-through Redis cache for current weather, keyed by normalized city name"""
+    
+    KEY_PREFIX = "weather:current:"
+    
+    def __init__(self, weather_service: WeatherService, ttl: Optional[int] = None):
+        self.weather_service = weather_service
+        self.ttl = ttl or settings.WEATHER_CACHE_TTL_SECONDS
+        self._flights = SingleFlight()
+    
+    async def get_current(self, city: str, redis_client) -> Dict[str, Any]:
+        """Return current weather from cache, a fresh stored reading, or upstream"""
+        key = normalize_city(city)
+        
+        cached = await redis_client.get(self.KEY_PREFIX + key)
+        if cached is not None:
+            record_weather_cache("hit")
+            return json.loads(cached)
+        
+        record_weather_cache("coalesced" if self._flights.is_inflight(key) else "miss")
+        return await self._flights.do(key, lambda: self._load(city, key, redis_client))
+    
+    async def _load(self, city: str, key: str, redis_client) -> Dict[str, Any]:
+        # Shared by every coalesced caller, so it uses its own session rather than a request's
+        async with AsyncSessionLocal() as db:
+            return await self._load_with(db, city, key, redis_client)
+    
+    async def _load_with(self, db: AsyncSession, city: str, key: str, redis_client) -> Dict[str, Any]:
+        now = datetime.now(timezone.utc)
+        
+        # Reuse the scheduler's latest reading while it is still fresh, matching the
+        # city the same way the cache key does (case and whitespace insensitive)
+        reading = await db.scalar(select(WeatherReading).where(
+            city_key(WeatherReading.city) == key,
+            WeatherReading.timestamp >= now - timedelta(seconds=self.ttl)
+        ).order_by(desc(WeatherReading.timestamp)).limit(1))
+        
+        if reading is None:
+            weather_data = await self.weather_service.fetch_weather_data(city)
+            reading = await self.weather_service.save_weather_reading_async(db, weather_data)
+            ttl = self.ttl
+        else:
+            age = (now - reading.timestamp).total_seconds()
+            ttl = max(1, int(self.ttl - age))
+        
+        payload = self._to_payload(reading)
+        await redis_client.set(self.KEY_PREFIX + key, json.dumps(payload), ex=ttl)
+        return payload
+    
+    @staticmethod
+    def _to_payload(reading: WeatherReading) -> Dict[str, Any]:
+        return {
+            "id": reading.id,
+            "city": reading.city,
+            "temperature": reading.temperature,
+            "humidity": reading.humidity,
+            "pressure": reading.pressure,
+            "aqi": reading.aqi,
+            "weather_condition": reading.weather_condition,
+            "timestamp": reading.timestamp.isoformat()
+        }
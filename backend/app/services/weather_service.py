@@ -1,48 +1,90 @@
+import asyncio
+import csv
+import io
 import httpx
-import json
-from typing import Dict, Any
+import numpy as np
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from sqlalchemy import func, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core.metrics import record_alert_publish
+from app.core.serialization import dumps
 from app.models.weather import WeatherReading, Alert
+from app.services.alert_bus import add_alerts
+from app.services.alert_stats import invalidate_alert_stats
+from app.services.alert_state import AlertStateTracker
+from app.services.coordinate_cache import CoordinateCache
 import redis.asyncio as redis
 
+# Columns filled from fetched weather data; id and timestamp come from the database
+READING_COLUMNS = ("city", "temperature", "humidity", "pressure", "aqi", "weather_condition")
+
 class WeatherService:
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, redis_client=None):
         self.api_key = settings.OPENWEATHER_API_KEY
         self.base_url = settings.OPENWEATHER_BASE_URL
-        
+        self.geo_url = settings.OPENWEATHER_GEO_URL
+        self._http_client = http_client
+        self.coordinates = CoordinateCache(redis_client)
+        self.alert_state = AlertStateTracker()
+    
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Injected client if one was given, otherwise the shared pooled client"""
+        return self._http_client or get_http_client()
+    
+    def bind_redis(self, redis_client):
+        """Use the given Redis client for the persistent coordinate cache"""
+        self.coordinates.redis_client = redis_client
+    
+    async def geocode_city(self, city: str) -> Tuple[float, float]:
+        """Resolve a city name to coordinates via the OpenWeatherMap geocoding API"""
+        response = await self.http_client.get(
+            f"{self.geo_url}/direct",
+            params={"q": city, "limit": 1, "appid": self.api_key}
+        )
+        locations = response.json()
+        if not locations:
+            raise ValueError(f"Unknown city: {city}")
+        return locations[0]["lat"], locations[0]["lon"]
+    
     async def fetch_weather_data(self, city: str) -> Dict[str, Any]:
         """Fetch weather data from OpenWeatherMap API"""
-        async with httpx.AsyncClient() as client:
-            # Current weather
-            weather_url = f"{self.base_url}/weather"
-            weather_params = {
-                "q": city,
-                "appid": self.api_key,
-                "units": "metric"
-            }
-            
-            # Air quality
-            aqi_url = f"{self.base_url}/air_pollution"
-            
-            weather_response = await client.get(weather_url, params=weather_params)
-            weather_data = weather_response.json()
-            
-            # Get coordinates for AQI
-            lat, lon = weather_data["coord"]["lat"], weather_data["coord"]["lon"]
-            aqi_params = {"lat": lat, "lon": lon, "appid": self.api_key}
-            
-            aqi_response = await client.get(aqi_url, params=aqi_params)
-            aqi_data = aqi_response.json()
-            
-            return {
-                "city": city,
-                "temperature": weather_data["main"]["temp"],
-                "humidity": weather_data["main"]["humidity"],
-                "pressure": weather_data["main"]["pressure"],
-                "aqi": aqi_data["list"][0]["main"]["aqi"],
-                "weather_condition": weather_data["weather"][0]["main"]
-            }
+        client = self.http_client
+        
+        # Coordinates come from the cache, so AQI does not wait on the weather call
+        lat, lon = await self.coordinates.get_or_load(city, lambda: self.geocode_city(city))
+        
+        # Current weather
+        weather_url = f"{self.base_url}/weather"
+        weather_params = {
+            "q": city,
+            "appid": self.api_key,
+            "units": "metric"
+        }
+        
+        # Air quality
+        aqi_url = f"{self.base_url}/air_pollution"
+        aqi_params = {"lat": lat, "lon": lon, "appid": self.api_key}
+        
+        weather_response, aqi_response = await asyncio.gather(
+            client.get(weather_url, params=weather_params),
+            client.get(aqi_url, params=aqi_params)
+        )
+        weather_data = weather_response.json()
+        aqi_data = aqi_response.json()
+        
+        return {
+            "city": city,
+            "temperature": weather_data["main"]["temp"],
+            "humidity": weather_data["main"]["humidity"],
+            "pressure": weather_data["main"]["pressure"],
+            "aqi": aqi_data["list"][0]["main"]["aqi"],
+            "weather_condition": weather_data["weather"][0]["main"]
+        }
     
     def save_weather_reading(self, db: Session, weather_data: Dict[str, Any]) -> WeatherReading:
         """Save weather reading to database"""
@@ -52,69 +94,169 @@ class WeatherService:
         db.refresh(reading)
         return reading
     
-    async def check_thresholds_and_alert(self, db: Session, reading: WeatherReading, redis_client):
-        """Check if weather data breaches thresholds and send alerts"""
-        alerts = []
+    async def save_weather_reading_async(self, db: AsyncSession, weather_data: Dict[str, Any]) -> WeatherReading:
+        """Save weather reading to database from an async session"""
+        reading = WeatherReading(**weather_data)
+        db.add(reading)
+        await db.commit()
+        await db.refresh(reading)
+        return reading
+    
+    def save_weather_readings(self, db: Session, readings: List[Dict[str, Any]],
+                              batch_size: Optional[int] = None, use_copy: Optional[bool] = None) -> List[int]:
+        """Bulk insert weather readings without committing; returns ids unless COPY is used"""
+        batch_size = batch_size or settings.DB_BATCH_SIZE
+        use_copy = settings.DB_USE_COPY if use_copy is None else use_copy
         
-        # Temperature alerts
-        if reading.temperature > settings.TEMP_HIGH_THRESHOLD:
-            alert = self._create_alert(
-                db, "temperature", settings.TEMP_HIGH_THRESHOLD, 
-                reading.temperature, reading.city,
-                f"High temperature alert: {reading.temperature}°C in {reading.city}"
-            )
-            alerts.append(alert)
-            
-        elif reading.temperature < settings.TEMP_LOW_THRESHOLD:
-            alert = self._create_alert(
-                db, "temperature", settings.TEMP_LOW_THRESHOLD,
-                reading.temperature, reading.city,
-                f"Low temperature alert: {reading.temperature}°C in {reading.city}"
-            )
-            alerts.append(alert)
-        
-        # Humidity alerts
-        if reading.humidity > settings.HUMIDITY_HIGH_THRESHOLD:
-            alert = self._create_alert(
-                db, "humidity", settings.HUMIDITY_HIGH_THRESHOLD,
-                reading.humidity, reading.city,
-                f"High humidity alert: {reading.humidity}% in {reading.city}"
-            )
-            alerts.append(alert)
-        
-        # AQI alerts
-        if reading.aqi and reading.aqi > settings.AQI_HIGH_THRESHOLD:
-            alert = self._create_alert(
-                db, "aqi", settings.AQI_HIGH_THRESHOLD,
-                reading.aqi, reading.city,
-                f"Poor air quality alert: AQI {reading.aqi} in {reading.city}"
+        if use_copy:
+            # COPY is the fastest bulk load path but cannot return generated ids
+            self._copy_weather_readings(db, readings)
+            return []
+        
+        ids = []
+        for batch in _batches(readings, batch_size):
+            ids.extend(db.scalars(
+                insert(WeatherReading).returning(WeatherReading.id, sort_by_parameter_order=True),
+                batch
+            ))
+        return ids
+    
+    def _copy_weather_readings(self, db: Session, readings: List[Dict[str, Any]]):
+        """Load readings with Postgres COPY on the session's own connection"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for reading in readings:
+            writer.writerow([reading.get(column) for column in READING_COLUMNS])
+        buffer.seek(0)
+        
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {WeatherReading.__tablename__} ({', '.join(READING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
             )
-            alerts.append(alert)
-        
-        # Publish alerts to Redis for WebSocket broadcasting
-        for alert in alerts:
-            alert_data = {
-                "id": alert.id,
-                "type": alert.alert_type,
-                "message": alert.message,
-                "city": alert.city,
-                "timestamp": alert.created_at.isoformat()
-            }
-            await redis_client.publish("weather_alerts", json.dumps(alert_data))
+        finally:
+            cursor.close()
+    
+    def save_alerts(self, db: Session, alert_rows: List[Dict[str, Any]],
+                    batch_size: Optional[int] = None) -> List[Alert]:
+        """Bulk insert alerts without committing, returning the created rows"""
+        batch_size = batch_size or settings.DB_BATCH_SIZE
+        alerts = []
+        for batch in _batches(alert_rows, batch_size):
+            alerts.extend(db.scalars(
+                insert(Alert).returning(Alert, sort_by_parameter_order=True),
+                batch
+            ))
+        return alerts
+    
+    async def save_cycle(self, db: Session, readings: List[Dict[str, Any]], redis_client) -> List[Alert]:
+        """Persist a whole cycle's readings and alerts in one transaction, then publish the alerts
+
+        Only breaches that are new (not already alerted and outside the cooldown)
+        create alerts; active alerts whose values cleared the hysteresis band are resolved.
+        """
+        states = await self.alert_state.load(redis_client, readings)
+        fire_rows, resolve_ids, state_updates = self.alert_state.plan(
+            readings, self.evaluate_cycle_thresholds(readings), states
+        )
+        
+        try:
+            self.save_weather_readings(db, readings)
+            alerts = self.save_alerts(db, fire_rows)
+            self.resolve_alerts(db, resolve_ids)
+            # Build payloads before commit expires the returned rows
+            payloads = [alert_payload(alert) for alert in alerts]
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
         
+        for row, alert in zip(fire_rows, alerts):
+            state_updates[self.alert_state.key(row["city"], row["alert_type"])]["alert_id"] = alert.id
+        await self.alert_state.save(redis_client, state_updates)
+        
+        await self.publish_alerts(payloads, redis_client)
+        if resolve_ids and not payloads:
+            await invalidate_alert_stats(redis_client)
         return alerts
     
-    def _create_alert(self, db: Session, alert_type: str, threshold: float, 
-                     actual: float, city: str, message: str) -> Alert:
-        """Create and save alert to database"""
-        alert = Alert(
-            alert_type=alert_type,
-            threshold_value=threshold,
-            actual_value=actual,
-            city=city,
-            message=message
+    def resolve_alerts(self, db: Session, alert_ids: List[int]):
+        """Mark alerts resolved without committing"""
+        if alert_ids:
+            db.execute(
+                update(Alert).where(Alert.id.in_(alert_ids)).values(is_resolved=True, resolved_at=func.now())
+            )
+    
+    def evaluate_cycle_thresholds(self, readings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return alert rows for a whole cycle, computing each metric's breaches in one vectorized pass"""
+        if not readings:
+            return []
+        
+        count = len(readings)
+        temperature = np.fromiter((reading["temperature"] for reading in readings), dtype=float, count=count)
+        humidity = np.fromiter((reading["humidity"] for reading in readings), dtype=float, count=count)
+        # Missing AQI becomes NaN, which never compares as a breach
+        aqi = np.fromiter(
+            (reading.get("aqi") if reading.get("aqi") is not None else np.nan for reading in readings),
+            dtype=float, count=count
         )
-        db.add(alert)
-        db.commit()
-        db.refresh(alert)
-        return alert
\ No newline at end of file
+        
+        temperature_high = temperature > settings.TEMP_HIGH_THRESHOLD
+        breaches = [
+            (temperature_high, "temperature", settings.TEMP_HIGH_THRESHOLD, "temperature",
+             "High temperature alert: {value}°C in {city}"),
+            (~temperature_high & (temperature < settings.TEMP_LOW_THRESHOLD), "temperature",
+             settings.TEMP_LOW_THRESHOLD, "temperature", "Low temperature alert: {value}°C in {city}"),
+            (humidity > settings.HUMIDITY_HIGH_THRESHOLD, "humidity", settings.HUMIDITY_HIGH_THRESHOLD,
+             "humidity", "High humidity alert: {value}% in {city}"),
+            (aqi > settings.AQI_HIGH_THRESHOLD, "aqi", settings.AQI_HIGH_THRESHOLD,
+             "aqi", "Poor air quality alert: AQI {value} in {city}"),
+        ]
+        
+        rows = []
+        for mask, alert_type, threshold, field, message in breaches:
+            for index in np.flatnonzero(mask):
+                reading = readings[index]
+                value, city = reading[field], reading["city"]
+                rows.append(_alert_row(alert_type, threshold, value, city, message.format(value=value, city=city)))
+        return rows
+    
+    async def publish_alerts(self, payloads: List[Dict[str, Any]], redis_client):
+        """Append alert payloads to the Redis alert stream for WebSocket broadcasting in one pipelined round trip"""
+        if not payloads:
+            return
+        
+        # Each payload is encoded once; the relay forwards the bytes to clients untouched
+        messages = [dumps(alert_data) for alert_data in payloads]
+        start_time = time.perf_counter()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            add_alerts(pipe, messages)
+            await pipe.execute()
+        record_alert_publish(len(messages), time.perf_counter() - start_time)
+        
+        await invalidate_alert_stats(redis_client)
+
+def alert_payload(alert: Alert) -> Dict[str, Any]:
+    """Message published for an alert"""
+    return {
+        "id": alert.id,
+        "type": alert.alert_type,
+        "message": alert.message,
+        "city": alert.city,
+        "timestamp": alert.created_at.isoformat()
+    }
+
+def _alert_row(alert_type: str, threshold_value: float, actual_value: float,
+               city: str, message: str) -> Dict[str, Any]:
+    return {
+        "alert_type": alert_type,
+        "threshold_value": threshold_value,
+        "actual_value": actual_value,
+        "city": city,
+        "message": message
+    }
+
+def _batches(rows: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
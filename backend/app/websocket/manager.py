@@ -1,32 +1,199 @@
 from fastapi import WebSocket
-from typing import List
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
 import json
+from app.core.cache import normalize_city
+from app.core.config import settings
+from app.core.metrics import (
+    update_websocket_connections, update_websocket_queue_depth, record_websocket_drop
+)
+
+# Matches any city or any alert type in a subscription topic
+WILDCARD = "*"
+
+Topic = Tuple[str, str]
+
+class ClientConnection:
+    """A connected WebSocket with its own bounded send queue"""
+    
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.sender: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.topics: Set[Topic] = set()
+        # Newest stream id that was never delivered live to this client, the upper bound for its replays
+        self.replay_until: Optional[str] = None
+        # Live alerts held back while a replay is read, so both reach the client in stream order
+        self.held: Optional[List[str]] = None
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, queue_size: Optional[int] = None, slow_consumer_policy: Optional[str] = None,
+                 send_timeout: Optional[float] = None):
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        self.queue_size = queue_size or settings.WS_SEND_QUEUE_SIZE
+        self.slow_consumer_policy = slow_consumer_policy or settings.WS_SLOW_CONSUMER_POLICY
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT
+        self._closing: Set[asyncio.Task] = set()
+        # (city, alert_type) -> clients subscribed to it, so routing only touches interested clients
+        self._subscribers: Dict[Topic, Set[ClientConnection]] = {}
+        # Stream id of the newest alert the relay has queued, or the id its group started after
+        self.last_alert_id: Optional[str] = None
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = ClientConnection(websocket, self.queue_size)
+        client.sender = asyncio.create_task(self._send_loop(client))
+        # Captured in the same step as registering, so replays stop where live delivery starts
+        client.replay_until = self.last_alert_id
+        self.active_connections[websocket] = client
+        # Clients receive every alert until they narrow their subscription
+        self._set_topics(client, {(WILDCARD, WILDCARD)})
+        update_websocket_connections(len(self.active_connections))
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client is None:
+            return
+        self._set_topics(client, set())
+        if client.sender is not None:
+            client.sender.cancel()
+        update_websocket_connections(len(self.active_connections))
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+        # Goes through the client's queue so it never races the sender task on the socket
+        client = self.active_connections.get(websocket)
+        if client is not None:
+            self._enqueue(client, message)
+
+    def subscribe(self, websocket: WebSocket, cities: Optional[Iterable[str]] = None,
+                  alert_types: Optional[Iterable[str]] = None):
+        """Replace a client's subscription; empty or missing filters match everything"""
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        city_keys = {normalize_city(city) for city in cities or []} or {WILDCARD}
+        type_keys = set(alert_types or []) or {WILDCARD}
+        self._set_topics(client, {(city, alert_type) for city in city_keys for alert_type in type_keys})
+
+    def stream_started(self, start_id: str):
+        """Record where the relay's consumer group starts reading the alert stream
+
+        Alerts up to start_id are never delivered live, so clients that connected
+        before the relay joined the stream replay up to it.
+        """
+        self.last_alert_id = start_id
+        for client in self.active_connections.values():
+            if client.replay_until is None:
+                client.replay_until = start_id
+
+    def _set_topics(self, client: ClientConnection, topics: Set[Topic]):
+        for topic in client.topics - topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self._subscribers[topic]
+        for topic in topics - client.topics:
+            self._subscribers.setdefault(topic, set()).add(client)
+        client.topics = topics
+
+    def queue_depths(self) -> Dict[WebSocket, int]:
+        """Number of messages waiting to be sent, per connection"""
+        return {websocket: client.queue.qsize() for websocket, client in self.active_connections.items()}
 
     async def broadcast(self, data: dict):
-        message = json.dumps(data)
-        disconnected = []
+        self.broadcast_text(json.dumps(data))
+
+    def broadcast_text(self, message: str):
+        """Queue an already serialized message for every client without waiting on sockets"""
+        max_depth = 0
+        for client in list(self.active_connections.values()):
+            self._enqueue(client, message)
+            max_depth = max(max_depth, client.queue.qsize())
+        update_websocket_queue_depth(max_depth)
+
+    def publish_alert(self, message: str, city: str, alert_type: str):
+        """Queue a serialized alert only for clients subscribed to its city and type"""
+        city_key = normalize_city(city or "")
+        recipients: Set[ClientConnection] = set()
+        for topic in ((city_key, alert_type), (city_key, WILDCARD),
+                      (WILDCARD, alert_type), (WILDCARD, WILDCARD)):
+            recipients.update(self._subscribers.get(topic, ()))
         
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                disconnected.append(connection)
+        max_depth = 0
+        for client in recipients:
+            if client.held is not None:
+                client.held.append(message)
+                continue
+            self._enqueue(client, message)
+            max_depth = max(max_depth, client.queue.qsize())
+        update_websocket_queue_depth(max_depth)
+
+    def hold_live(self, websocket: WebSocket) -> Optional[str]:
+        """Hold back live alerts for a client until replay() runs; returns its replay upper bound"""
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return None
+        if client.held is None:
+            client.held = []
+        return client.replay_until
+
+    def replay(self, websocket: WebSocket, alerts: Iterable[dict]):
+        """Queue missed alerts for one client, filtered by its current subscription, then any held live ones"""
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        held, client.held = client.held or [], None
+        for alert in alerts:
+            city_key = normalize_city(alert.get("city") or "")
+            alert_type = alert.get("type")
+            if client.topics & {(city_key, alert_type), (city_key, WILDCARD),
+                                (WILDCARD, alert_type), (WILDCARD, WILDCARD)}:
+                self._enqueue(client, json.dumps(alert))
+        for message in held:
+            self._enqueue(client, message)
+
+    def _enqueue(self, client: ClientConnection, message: str):
+        try:
+            client.queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
         
-        # Remove disconnected clients
-        for connection in disconnected:
-            self.disconnect(connection)
\ No newline at end of file
+        record_websocket_drop(self.slow_consumer_policy)
+        if self.slow_consumer_policy == "disconnect":
+            # Close slow consumers so they reconnect instead of holding a stale backlog
+            self.disconnect(client.websocket)
+            self._schedule_close(client.websocket)
+        else:
+            # Drop the oldest queued message so the client keeps receiving the newest ones
+            client.queue.get_nowait()
+            client.queue.put_nowait(message)
+            client.dropped += 1
+
+    async def _send_loop(self, client: ClientConnection):
+        try:
+            while True:
+                message = await client.queue.get()
+                await asyncio.wait_for(client.websocket.send_text(message), timeout=self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            # A socket that cannot take a frame within the timeout is treated as stalled
+            record_websocket_drop("timeout")
+            self._schedule_close(client.websocket)
+            self.disconnect(client.websocket)
+        except Exception:
+            self.disconnect(client.websocket)
+
+    def _schedule_close(self, websocket: WebSocket):
+        task = asyncio.create_task(self._close(websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)
+        except Exception:
+            pass
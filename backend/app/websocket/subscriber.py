@@ -0,0 +1,59 @@
+import asyncio
+from typing import Optional
+from app.core.serialization import dumps
+from app.services.alert_bus import (
+    ALERT_STREAM, consumer_group, decode_entry, destroy_group, ensure_group, prune_stale_groups, touch_group
+)
+from app.websocket.manager import ConnectionManager
+
+async def relay_alerts(redis_client, manager: ConnectionManager, group: Optional[str] = None,
+                       consumer: str = "relay", batch_size: int = 100, block_ms: int = 5000,
+                       retry_delay: float = 1.0):
+    """Forward alerts from this process's consumer group on the alert stream to its WebSocket clients
+
+    Entries are acked once queued for clients. After a read error, entries that were
+    delivered but never acked are re-read first, then new ones. The group is destroyed
+    when the relay is cancelled.
+    """
+    group = group or consumer_group()
+    try:
+        while True:
+            try:
+                await touch_group(redis_client, group)
+                start_id = await ensure_group(redis_client, group)
+                if start_id is not None:
+                    manager.stream_started(start_id)
+                await prune_stale_groups(redis_client)
+                # "0" reads this consumer's pending entries; ">" reads entries never delivered
+                last_id = "0"
+                while True:
+                    await touch_group(redis_client, group)
+                    response = await redis_client.xreadgroup(
+                        group, consumer, {ALERT_STREAM: last_id}, count=batch_size, block=block_ms
+                    )
+                    entries = response[0][1] if response else []
+                    if not entries:
+                        last_id = ">"
+                        continue
+                    
+                    for entry_id, fields in entries:
+                        alert = decode_entry(entry_id, fields)
+                        if alert is None:
+                            continue
+                        # Serialize once with the stream id so clients can resume from it
+                        manager.publish_alert(dumps(alert).decode(), alert.get("city"), alert.get("type"))
+                        manager.last_alert_id = alert["stream_id"]
+                    
+                    await redis_client.xack(ALERT_STREAM, group, *[entry_id for entry_id, _ in entries])
+                    if last_id != ">":
+                        last_id = entries[-1][0]
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Alert stream read failed, retrying in {retry_delay}s: {str(e)}")
+                await asyncio.sleep(retry_delay)
+    finally:
+        try:
+            await destroy_group(redis_client, group)
+        except Exception as e:
+            print(f"Failed to remove alert stream group {group}: {str(e)}")
@@ -0,0 +1,91 @@
+"""Alert publish throughput: one XADD round trip per alert versus a pipelined cycle
+
+Publishes batches of alert payloads the old way (stdlib json and an awaited XADD per
+alert) and through WeatherService.publish_alerts (orjson and one pipeline per batch,
+plus the INCR that invalidates cached alert stats).
+It runs against an in-process fakeredis by default, which has no network latency and
+so understates the gain from pipelining. Pass --redis-url to use a real server.
+
+    cd backend
+    pip install fakeredis
+    python benchmarks/alert_publish.py --batches 1 10 100 1000
+    python benchmarks/alert_publish.py --redis-url redis://localhost:6379/15
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import redis.asyncio as redis
+from app.core.config import settings
+from app.core.serialization import dumps
+from app.services.alert_bus import ALERT_STREAM, ENTRY_FIELD
+from app.services.weather_service import WeatherService
+
+def payloads(count: int):
+    timestamp = datetime.now(timezone.utc).isoformat()
+    return [
+        {"id": index, "type": "temperature", "message": f"High temperature alert: 36.{index % 10}°C in City {index}",
+         "city": f"City {index}", "timestamp": timestamp}
+        for index in range(count)
+    ]
+
+async def publish_one_by_one(redis_client, batch):
+    """The previous path: a separate round trip for every alert"""
+    for alert in batch:
+        await redis_client.xadd(ALERT_STREAM, {ENTRY_FIELD: json.dumps(alert)},
+                                maxlen=settings.ALERT_STREAM_MAXLEN, approximate=True)
+
+async def throughput(publish, batch, total: int) -> float:
+    rounds = max(1, total // len(batch))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await publish(batch)
+    return rounds * len(batch) / (time.perf_counter() - start)
+
+def connect(redis_url):
+    if redis_url:
+        return redis.from_url(redis_url)
+    try:
+        import fakeredis
+    except ImportError:
+        sys.exit("fakeredis is not installed: pip install fakeredis, or pass --redis-url")
+    return fakeredis.FakeAsyncRedis()
+
+async def benchmark(args):
+    redis_client = connect(args.redis_url)
+    weather_service = WeatherService()
+    try:
+        sample = payloads(10_000)
+        for name, encode in (("json", lambda alert: json.dumps(alert).encode()), ("dumps", dumps)):
+            start = time.perf_counter()
+            for alert in sample:
+                encode(alert)
+            print(f"{name:>6}: {(time.perf_counter() - start) / len(sample) * 1e6:.2f}us per payload")
+
+        print(f"\n{'batch':>6} {'per alert (alerts/s)':>22} {'pipelined (alerts/s)':>22} {'speedup':>8}")
+        for size in args.batches:
+            batch = payloads(size)
+            one_by_one = await throughput(lambda batch: publish_one_by_one(redis_client, batch), batch, args.alerts)
+            pipelined = await throughput(lambda batch: weather_service.publish_alerts(batch, redis_client),
+                                         batch, args.alerts)
+            print(f"{size:>6} {one_by_one:>22,.0f} {pipelined:>22,.0f} {pipelined / one_by_one:>7.1f}x")
+    finally:
+        await redis_client.delete(ALERT_STREAM)
+        await redis_client.aclose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 10, 100, 1000],
+                        help="alerts published per cycle")
+    parser.add_argument("--alerts", type=int, default=20_000, help="alerts published per batch size and mode")
+    parser.add_argument("--redis-url", default=None, help="real Redis server to use instead of fakeredis")
+    asyncio.run(benchmark(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
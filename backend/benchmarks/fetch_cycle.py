@@ -0,0 +1,158 @@
+"""Scheduler fetch cycle time against a local fake OpenWeatherMap server
+
+Runs the scheduler's concurrent fetch engine over 10, 1k and 10k cities and prints
+cycle time and throughput for each. Persistence is left out, so only the HTTP
+fan-out is measured.
+
+    cd backend
+    python benchmarks/fetch_cycle.py --latency 0.05 --concurrency 20
+    python benchmarks/fetch_cycle.py --sizes 1000 --slow-every 100 --timeout 2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'scheduler'))
+
+from app.core.http_client import create_http_client
+from app.services.weather_service import WeatherService
+from weather_scheduler import CycleStats, WeatherScheduler
+
+class FakeOpenWeatherMap:
+    """HTTP/1.1 keep-alive server answering the geocoding, weather and air pollution calls
+
+    Runs its own event loop in a thread so serving does not compete with the scheduler.
+    Cities named in `slow` answer after `slow_latency` instead of `latency`.
+    """
+
+    def __init__(self, latency: float, slow_latency: float = 0.0, slow=()):
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow = set(slow)
+        self.port = None
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._stopped = asyncio.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._loop.call_soon_threadsafe(self._stopped.set)
+        self._thread.join()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def _serve(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._run())
+        self._loop.close()
+
+    async def _run(self):
+        server = await asyncio.start_server(self._handle, "127.0.0.1", 0, backlog=4096)
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        await self._stopped.wait()
+
+        server.close()
+        handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+                target = urlsplit(request_line.split()[1].decode())
+                query = parse_qs(target.query)
+
+                city = query.get("q", [""])[0]
+                await asyncio.sleep(self.slow_latency if city in self.slow else self.latency)
+                body = json.dumps(self._body(target.path, city)).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _body(path: str, city: str):
+        if path.endswith("/direct"):
+            return [{"name": city, "lat": 51.5, "lon": -0.1}]
+        if path.endswith("/air_pollution"):
+            return {"list": [{"main": {"aqi": 2}}]}
+        return {"main": {"temp": 21.5, "humidity": 60, "pressure": 1012}, "weather": [{"main": "Clouds"}]}
+
+async def run_cycle(scheduler: WeatherScheduler, cities) -> CycleStats:
+    """One fetch cycle through the scheduler's bounded, per-city timed fetches"""
+    stats = CycleStats(cities=len(cities))
+    start = asyncio.get_running_loop().time()
+    await asyncio.gather(*(scheduler._fetch_city_bounded(city, stats) for city in cities))
+    stats.duration = asyncio.get_running_loop().time() - start
+    return stats
+
+async def benchmark(args):
+    cities = [f"City {index}" for index in range(max(args.sizes))]
+    slow = cities[::args.slow_every] if args.slow_every else ()
+
+    with FakeOpenWeatherMap(args.latency, slow_latency=args.timeout * 2, slow=slow) as server:
+        http_client = create_http_client()
+        scheduler = WeatherScheduler()
+        scheduler.weather_service = WeatherService(http_client=http_client)
+        scheduler.weather_service.base_url = server.url
+        scheduler.weather_service.geo_url = server.url
+        scheduler.city_timeout = args.timeout
+        if args.concurrency:
+            scheduler.concurrency = args.concurrency
+            scheduler.fetch_slots = asyncio.Semaphore(args.concurrency)
+
+        print(f"latency {args.latency * 1000:.0f}ms, concurrency {scheduler.concurrency}, "
+              f"timeout {scheduler.city_timeout}s, {len(slow)} slow cities")
+        print(f"{'cities':>8} {'cycle (s)':>10} {'cities/s':>10} {'ok':>7} {'failed':>7} {'timed out':>10}")
+        try:
+            for size in args.sizes:
+                # Geocoding is cached after the first cycle, as it is in a running scheduler
+                await run_cycle(scheduler, cities[:size])
+                stats = await run_cycle(scheduler, cities[:size])
+                print(f"{size:>8} {stats.duration:>10.2f} {stats.throughput:>10.1f} {stats.succeeded:>7} "
+                      f"{stats.failed:>7} {stats.timed_out:>10}")
+        finally:
+            await http_client.aclose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--latency", type=float, default=0.05, help="fake server response time in seconds")
+    parser.add_argument("--concurrency", type=int, default=None, help="defaults to SCHEDULER_CONCURRENCY")
+    parser.add_argument("--timeout", type=float, default=5.0, help="per-city timeout in seconds")
+    parser.add_argument("--slow-every", type=int, default=0,
+                        help="make every Nth city answer after twice the timeout")
+    args = parser.parse_args()
+
+    # The scheduler logs every fetch and failure, which would dominate the measurement;
+    # failures are counted in the results instead
+    logging.disable(logging.ERROR)
+    asyncio.run(benchmark(args))
+
+if __name__ == "__main__":
+    main()
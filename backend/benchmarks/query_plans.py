@@ -0,0 +1,160 @@
+"""Latency and query plans of the history and alert endpoints on a seeded database
+
+Seeds DATABASE_URL with synthetic readings and alerts, then times the queries behind
+get_weather_history, get_latest_readings, get_alerts and get_alert_stats and prints
+EXPLAIN (ANALYZE, BUFFERS) for every statement they issue. Seeded rows use the city
+prefix "Bench City" and are removed with --clean.
+
+    cd backend
+    alembic upgrade head
+    python benchmarks/query_plans.py --seed --readings 10000000 --alerts 1000000
+    python benchmarks/query_plans.py --runs 50
+    python benchmarks/query_plans.py --clean
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import event, text
+from app.api.alerts import get_alerts
+from app.core.database import AsyncSessionLocal, SessionLocal, async_engine
+from app.services import history
+from app.services.alert_stats import compute_alert_stats
+from app.services.retention import DEFAULT_PARTITION, _create_partition, _table_exists, partition_name
+
+CITY_PREFIX = "Bench City"
+
+def seed(readings: int, alerts: int, cities: int, days: int):
+    """Insert readings spread evenly over the last `days` days, one day per transaction"""
+    db = SessionLocal()
+    try:
+        today = datetime.now(timezone.utc).date()
+        db.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF weather_readings DEFAULT"))
+        for offset in range(days + 1):
+            day = today - timedelta(days=offset)
+            if not _table_exists(db, partition_name(day)):
+                _create_partition(db, partition_name(day), day)
+        db.commit()
+
+        per_day = readings // days
+        span = days * 86400
+        for offset in range(days):
+            start = time.perf_counter()
+            db.execute(text("""
+                INSERT INTO weather_readings (city, temperature, humidity, pressure, aqi, weather_condition, timestamp)
+                SELECT :prefix || ' ' || (n % :cities),
+                       10 + random() * 25, 20 + random() * 75, 990 + random() * 40,
+                       1 + (random() * 4)::int, 'Clouds',
+                       now() - make_interval(secs => n::float8 * :span / :total)
+                FROM generate_series(:first, :last) AS n
+            """), {"prefix": CITY_PREFIX, "cities": cities, "span": span, "total": per_day * days,
+                   "first": offset * per_day, "last": (offset + 1) * per_day - 1})
+            db.commit()
+            print(f"seeded day {offset + 1}/{days}: {per_day} readings in {time.perf_counter() - start:.1f}s")
+
+        db.execute(text("""
+            INSERT INTO alerts (alert_type, threshold_value, actual_value, city, message, is_resolved, created_at)
+            SELECT (ARRAY['temperature', 'humidity', 'aqi'])[1 + n % 3], 35, 36,
+                   :prefix || ' ' || (n % :cities), 'benchmark alert', random() < 0.8,
+                   now() - make_interval(secs => n::float8 * :span / :total)
+            FROM generate_series(0, :total - 1) AS n
+        """), {"prefix": CITY_PREFIX, "cities": cities, "span": span, "total": alerts})
+        db.commit()
+        print(f"seeded {alerts} alerts")
+
+        db.execute(text("ANALYZE weather_readings"))
+        db.execute(text("ANALYZE alerts"))
+        db.commit()
+    finally:
+        db.close()
+
+def clean():
+    db = SessionLocal()
+    try:
+        readings = db.execute(text("DELETE FROM weather_readings WHERE city LIKE :prefix"),
+                              {"prefix": f"{CITY_PREFIX} %"}).rowcount
+        alerts = db.execute(text("DELETE FROM alerts WHERE city LIKE :prefix"),
+                            {"prefix": f"{CITY_PREFIX} %"}).rowcount
+        db.commit()
+        print(f"removed {readings} readings and {alerts} alerts")
+    finally:
+        db.close()
+
+def cases():
+    """Name and call of each query, run with an async session"""
+    now = datetime.now(timezone.utc)
+    city = f"{CITY_PREFIX} 42"
+    return [
+        ("history 24h", lambda db: history.get_history(db, city, now - timedelta(hours=24), 100)),
+        ("history 7d", lambda db: history.get_history(db, city, now - timedelta(days=7), 100)),
+        ("latest", lambda db: history.get_latest(db, 10)),
+        ("alerts", lambda db: get_alerts(db=db, city=None, alert_type=None, resolved=None, hours=24, limit=50)),
+        ("alerts by city", lambda db: get_alerts(db=db, city=city, alert_type=None, resolved=None,
+                                                 hours=168, limit=50)),
+        ("alerts by type, unresolved", lambda db: get_alerts(db=db, city=None, alert_type="aqi", resolved=False,
+                                                             hours=24, limit=50)),
+        ("alert stats 24h", lambda db: compute_alert_stats(db, 24)),
+    ]
+
+async def measure(runs: int, explain: bool):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        for name, query in cases():
+            timings = []
+            async with AsyncSessionLocal() as db:
+                # An untimed first run opens the connection and warms the cache
+                await query(db)
+                await db.rollback()
+                for _ in range(runs):
+                    statements.clear()
+                    start = time.perf_counter()
+                    await query(db)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    await db.rollback()
+                issued = list(statements)
+
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"\n== {name}: median {statistics.median(timings):.2f}ms, p95 {p95:.2f}ms over {runs} runs")
+            if not explain:
+                continue
+            async with async_engine.connect() as conn:
+                for statement, parameters in issued:
+                    plan = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                    print("\n".join(row[0] for row in plan))
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+        await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", action="store_true", help="insert synthetic data before measuring")
+    parser.add_argument("--clean", action="store_true", help="remove seeded data and exit")
+    parser.add_argument("--readings", type=int, default=10_000_000)
+    parser.add_argument("--alerts", type=int, default=1_000_000)
+    parser.add_argument("--cities", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=7, help="seeded span, within READINGS_RETENTION_DAYS")
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--no-explain", action="store_true", help="only report latencies")
+    args = parser.parse_args()
+
+    if args.clean:
+        clean()
+        return
+    if args.seed:
+        seed(args.readings, args.alerts, args.cities, args.days)
+    asyncio.run(measure(args.runs, not args.no_explain))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""CustomAlertIndex build, match and update cost at a million rules
+
+Builds the scheduler's rule index from synthetic rules, matches one reading per city
+as a poll cycle does, and compares the per-reading cost with a linear scan over all
+rules. Incremental upserts and removes are timed the way user_alerts.py changes
+arrive through follow_rule_changes.
+
+    cd backend
+    python benchmarks/rule_index.py --rules 1000000 --cities 10000
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.rule_engine import ALERT_TYPE_METRICS, CustomAlertIndex, Rule
+
+# Threshold and reading ranges per reading field
+RANGES = {"temperature": (-10.0, 40.0), "humidity": (0.0, 100.0), "aqi": (1.0, 5.0)}
+
+def make_rule(rule_id: int, cities: int, rng: random.Random) -> Rule:
+    alert_type = rng.choice(list(ALERT_TYPE_METRICS))
+    low, high = RANGES[ALERT_TYPE_METRICS[alert_type][0]]
+    return Rule(
+        id=rule_id,
+        user_id=rule_id,
+        email=f"user{rule_id}@example.com",
+        city=f"City {rng.randrange(cities)}",
+        alert_type=alert_type,
+        threshold_value=round(rng.uniform(low, high), 1),
+        email_enabled=True,
+        sms_enabled=False
+    )
+
+def make_reading(city: str, rng: random.Random):
+    reading = {field: rng.uniform(low, high) for field, (low, high) in RANGES.items()}
+    reading["aqi"] = round(reading["aqi"])
+    reading["city"] = city
+    return reading
+
+def scan(rules, reading):
+    """Baseline: test every rule against the reading"""
+    matches = []
+    for rule in rules:
+        if rule.city != reading["city"]:
+            continue
+        field, above = ALERT_TYPE_METRICS[rule.alert_type]
+        value = reading[field]
+        if value > rule.threshold_value if above else value < rule.threshold_value:
+            matches.append((rule, value))
+    return matches
+
+def max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def benchmark(args):
+    rng = random.Random(args.seed)
+    rules = [make_rule(rule_id, args.cities, rng) for rule_id in range(args.rules)]
+    readings = [make_reading(f"City {index}", rng) for index in range(args.cities)]
+
+    rss_before = max_rss_mb()
+    index = CustomAlertIndex()
+    start = time.perf_counter()
+    for rule in rules:
+        index.upsert(rule)
+    build = time.perf_counter() - start
+    print(f"built {len(index)} rules over {args.cities} cities in {build:.2f}s "
+          f"({len(index) / build:,.0f} upserts/s, max RSS +{max_rss_mb() - rss_before:.0f} MB)")
+
+    start = time.perf_counter()
+    matched = sum(len(index.match(reading)) for reading in readings)
+    cycle = time.perf_counter() - start
+    print(f"matched a cycle of {len(readings)} readings in {cycle * 1000:.1f}ms "
+          f"({cycle / len(readings) * 1e6:.1f}us/reading, {matched} rules triggered)")
+
+    sample = readings[:args.scan_sample]
+    start = time.perf_counter()
+    for reading in sample:
+        scan(rules, reading)
+    per_reading = (time.perf_counter() - start) / len(sample)
+    print(f"linear scan: {per_reading * 1000:.1f}ms/reading, "
+          f"{per_reading * len(readings):.0f}s for the same cycle (from {len(sample)} readings)")
+
+    changed = [make_rule(rng.randrange(args.rules), args.cities, rng) for _ in range(args.updates)]
+    start = time.perf_counter()
+    for rule in changed:
+        index.upsert(rule)
+    upserts = time.perf_counter() - start
+    start = time.perf_counter()
+    for rule in changed:
+        index.remove(rule.id)
+    removes = time.perf_counter() - start
+    print(f"{args.updates} updates: upsert {upserts / args.updates * 1e6:.1f}us, "
+          f"remove {removes / args.updates * 1e6:.1f}us each")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, default=1_000_000)
+    parser.add_argument("--cities", type=int, default=10_000, help="cities the rules are spread over")
+    parser.add_argument("--updates", type=int, default=10_000, help="incremental changes to time")
+    parser.add_argument("--scan-sample", type=int, default=20, help="readings timed for the linear scan")
+    parser.add_argument("--seed", type=int, default=1)
+    benchmark(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
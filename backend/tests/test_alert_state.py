@@ -0,0 +1,106 @@
+from app.services.alert_state import AlertStateTracker
+
+HYSTERESIS = {"temperature": 1.0, "humidity": 5.0, "aqi": 10.0}
+
+def tracker(cooldown=600):
+    return AlertStateTracker(cooldown=cooldown, hysteresis=HYSTERESIS)
+
+def reading(temperature=20.0, humidity=50.0, aqi=None, city="London"):
+    return {"city": city, "temperature": temperature, "humidity": humidity, "aqi": aqi}
+
+def breach(alert_type, threshold, value, city="London"):
+    return {
+        "alert_type": alert_type,
+        "threshold_value": threshold,
+        "actual_value": value,
+        "city": city,
+        "message": f"{alert_type} alert"
+    }
+
+def active_state(threshold, above, alert_id=7, fired_at=0.0):
+    return {"active": True, "alert_id": alert_id, "threshold": threshold, "above": above, "fired_at": fired_at}
+
+def test_new_breach_fires_and_records_state():
+    row = breach("temperature", 35, 36)
+    fire_rows, resolve_ids, updates = tracker().plan([reading(temperature=36)], [row], {}, now=1000)
+
+    assert fire_rows == [row]
+    assert resolve_ids == []
+    assert updates == {"london|temperature": {
+        "active": True, "alert_id": None, "threshold": 35, "above": True, "fired_at": 1000
+    }}
+
+def test_ongoing_breach_does_not_fire_again():
+    states = {"london|temperature": active_state(35, above=True)}
+    fire_rows, resolve_ids, updates = tracker().plan(
+        [reading(temperature=37)], [breach("temperature", 35, 37)], states, now=5000
+    )
+
+    assert (fire_rows, resolve_ids, updates) == ([], [], {})
+
+def test_breach_within_cooldown_does_not_fire():
+    states = {"london|humidity": {**active_state(80, above=True, fired_at=500), "active": False, "resolved_at": 900}}
+    fire_rows, _, updates = tracker(cooldown=600).plan(
+        [reading(humidity=90)], [breach("humidity", 80, 90)], states, now=1000
+    )
+
+    assert fire_rows == []
+    assert updates == {}
+
+def test_breach_after_cooldown_fires_again():
+    states = {"london|humidity": {**active_state(80, above=True), "active": False, "resolved_at": 900}}
+    fire_rows, _, updates = tracker(cooldown=600).plan(
+        [reading(humidity=90)], [breach("humidity", 80, 90)], states, now=700
+    )
+
+    assert len(fire_rows) == 1
+    assert updates["london|humidity"]["fired_at"] == 700
+
+def test_active_alert_resolves_only_past_the_hysteresis_band():
+    states = {"london|temperature": active_state(35, above=True)}
+
+    # Back under the threshold but inside the band
+    fire_rows, resolve_ids, updates = tracker().plan([reading(temperature=34.5)], [], states, now=100)
+    assert (fire_rows, resolve_ids, updates) == ([], [], {})
+
+    fire_rows, resolve_ids, updates = tracker().plan([reading(temperature=34)], [], states, now=100)
+    assert fire_rows == []
+    assert resolve_ids == [7]
+    assert updates["london|temperature"]["active"] is False
+    assert updates["london|temperature"]["resolved_at"] == 100
+
+def test_low_alert_resolves_above_the_band():
+    states = {"london|temperature": active_state(0, above=False)}
+
+    _, resolve_ids, _ = tracker().plan([reading(temperature=0.5)], [], states, now=100)
+    assert resolve_ids == []
+
+    _, resolve_ids, _ = tracker().plan([reading(temperature=1)], [], states, now=100)
+    assert resolve_ids == [7]
+
+def test_direction_flip_resolves_old_alert_and_fires_new_one():
+    states = {"london|temperature": active_state(35, above=True, fired_at=990)}
+    row = breach("temperature", 0, -5)
+    fire_rows, resolve_ids, updates = tracker(cooldown=600).plan(
+        [reading(temperature=-5)], [row], states, now=1000
+    )
+
+    assert fire_rows == [row]
+    assert resolve_ids == [7]
+    assert updates["london|temperature"]["above"] is False
+    assert updates["london|temperature"]["threshold"] == 0
+
+def test_missing_value_keeps_alert_active():
+    states = {"london|aqi": active_state(150, above=True)}
+    fire_rows, resolve_ids, updates = tracker().plan([reading(aqi=None)], [], states, now=100)
+
+    assert (fire_rows, resolve_ids, updates) == ([], [], {})
+
+def test_state_is_keyed_by_normalized_city():
+    states = {"new york|temperature": active_state(35, above=True)}
+    fire_rows, _, _ = tracker().plan(
+        [reading(city="New  York", temperature=38)], [breach("temperature", 35, 38, city="New  York")],
+        states, now=100
+    )
+
+    assert fire_rows == []
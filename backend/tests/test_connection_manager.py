@@ -0,0 +1,62 @@
+import asyncio
+import json
+from app.websocket.manager import ConnectionManager
+
+class FakeWebSocket:
+    """Collects the frames a client would receive"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.sent.append(json.loads(message))
+
+def alert(stream_id, city="London", alert_type="temperature"):
+    return {"stream_id": stream_id, "city": city, "type": alert_type}
+
+def publish(manager, stream_id):
+    manager.publish_alert(json.dumps(alert(stream_id)), "London", "temperature")
+    manager.last_alert_id = stream_id
+
+async def test_replay_bound_is_fixed_when_the_client_connects():
+    manager = ConnectionManager(queue_size=10)
+    manager.last_alert_id = "5-0"
+    websocket = FakeWebSocket()
+    await manager.connect(websocket)
+    publish(manager, "6-0")
+
+    # 6-0 was delivered live, so a replay must stop before it
+    assert manager.hold_live(websocket) == "5-0"
+    manager.disconnect(websocket)
+
+async def test_clients_connected_before_the_relay_replay_up_to_its_group_start():
+    manager = ConnectionManager(queue_size=10)
+    early = FakeWebSocket()
+    await manager.connect(early)
+    manager.stream_started("3-0")
+    publish(manager, "4-0")
+    late = FakeWebSocket()
+    await manager.connect(late)
+
+    assert manager.hold_live(early) == "3-0"
+    assert manager.hold_live(late) == "4-0"
+    manager.disconnect(early)
+    manager.disconnect(late)
+
+async def test_live_alerts_during_a_replay_follow_the_replayed_ones():
+    manager = ConnectionManager(queue_size=10)
+    manager.last_alert_id = "2-0"
+    websocket = FakeWebSocket()
+    await manager.connect(websocket)
+
+    manager.hold_live(websocket)
+    publish(manager, "3-0")
+    manager.replay(websocket, [alert("1-0"), alert("2-0")])
+    publish(manager, "4-0")
+    await asyncio.sleep(0.05)
+
+    assert [frame["stream_id"] for frame in websocket.sent] == ["1-0", "2-0", "3-0", "4-0"]
+    manager.disconnect(websocket)
@@ -0,0 +1,212 @@
+import asyncio
+import time
+from email import message_from_bytes
+import httpx
+from prometheus_client import REGISTRY
+from app.core.config import settings
+from app.core.smtp_pool import SMTPPool
+from app.services.notification_dispatcher import Notification, NotificationDispatcher, TokenBucket
+from app.services.notification_service import NotificationService
+
+class SMTPStandIn:
+    """Local SMTP server speaking just enough of the protocol to accept messages"""
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        self.port = None
+        self._server = None
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        writer.write(b"220 localhost ready\r\n")
+        recipients = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode().strip()
+            verb = command.upper()
+            if verb.startswith(("EHLO", "HELO")):
+                writer.write(b"250-localhost\r\n250 8BITMIME\r\n")
+            elif verb.startswith("RCPT TO:"):
+                recipients.append(command[len("RCPT TO:"):].strip().strip("<>"))
+                writer.write(b"250 OK\r\n")
+            elif verb == "DATA":
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+                lines = []
+                while True:
+                    data = await reader.readline()
+                    if data in (b".\r\n", b""):
+                        break
+                    lines.append(data)
+                self.messages.append((recipients, message_from_bytes(b"".join(lines))))
+                recipients = []
+                writer.write(b"250 OK\r\n")
+            elif verb == "QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+class SMSStandIn:
+    """HTTP transport standing in for the SMS provider, failing the first `failures` requests"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.requests = []
+        self.times = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.times.append(time.monotonic())
+        if len(self.requests) <= self.failures:
+            return httpx.Response(500, text="provider unavailable")
+        return httpx.Response(201, json={"sid": f"SM{len(self.requests)}"})
+
+def dispatcher(smtp_port=None, sms=None, **options):
+    service = NotificationService(
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(sms or SMSStandIn())),
+        smtp_pool=SMTPPool(hostname="127.0.0.1", port=smtp_port or 2525, username="", password="",
+                           size=2, timeout=5)
+    )
+    options.setdefault("rate_limits", {"email": 1000, "sms": 1000})
+    options.setdefault("digest_window", 0)
+    return NotificationDispatcher(service, workers=2, queue_size=100, **options)
+
+async def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+async def test_token_bucket_allows_bursts_up_to_capacity():
+    bucket = TokenBucket(rate=1, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        await bucket.acquire()
+
+    assert time.monotonic() - start < 0.1
+
+async def test_token_bucket_paces_sends_to_the_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+    start = time.monotonic()
+    for _ in range(5):
+        await bucket.acquire()
+
+    # The first token is available immediately, the next four arrive every 50ms
+    assert time.monotonic() - start >= 0.18
+
+async def test_emails_are_delivered_over_smtp():
+    async with SMTPStandIn() as smtp:
+        notifications = dispatcher(smtp.port)
+        notifications.start()
+        await notifications.submit(Notification("email", "a@example.com", "Heat alert", "36°C in London"))
+        await notifications.stop(timeout=5)
+        await notifications.notification_service.smtp_pool.close()
+
+    [(recipients, message)] = smtp.messages
+    assert recipients == ["a@example.com"]
+    assert message["Subject"] == "Heat alert"
+
+async def test_digest_coalesces_alerts_per_recipient_and_channel():
+    async with SMTPStandIn() as smtp:
+        notifications = dispatcher(smtp.port, digest_window=60)
+        notifications.start()
+        for index in range(3):
+            await notifications.submit(Notification("email", "a@example.com", "Alert", f"alert {index}"))
+        await notifications.submit(Notification("email", "b@example.com", "Heat alert", "36°C in London"))
+        # Stopping flushes pending digests without waiting for the window
+        await notifications.stop(timeout=5)
+        await notifications.notification_service.smtp_pool.close()
+
+    subjects = {recipients[0]: message["Subject"] for recipients, message in smtp.messages}
+    assert subjects == {"a@example.com": "3 weather alerts", "b@example.com": "Heat alert"}
+
+async def test_email_batch_shares_one_session(monkeypatch):
+    monkeypatch.setattr(settings, "SMTP_MAX_RECIPIENTS", 2)
+    recipients = ["a@example.com", "b@example.com", "c@example.com"]
+    async with SMTPStandIn() as smtp:
+        notifications = dispatcher(smtp.port, digest_window=60)
+        notifications.start()
+        await notifications.submit(Notification.email_batch(recipients, "Heat alert", "36°C in London"))
+        await notifications.stop(timeout=5)
+        await notifications.notification_service.smtp_pool.close()
+
+    # Chunked by SMTP_MAX_RECIPIENTS, with every chunk sent over the same connection
+    assert [chunk for chunk, _ in smtp.messages] == [recipients[:2], recipients[2:]]
+    assert smtp.connections == 1
+
+async def test_sms_is_posted_to_the_provider():
+    sms = SMSStandIn()
+    notifications = dispatcher(sms=sms)
+    notifications.start()
+    await notifications.submit(Notification("sms", "+15550100", "", "36°C in London"))
+    await notifications.stop(timeout=5)
+
+    [request] = sms.requests
+    assert request.method == "POST"
+    assert b"To=%2B15550100" in request.content
+
+async def test_failed_sends_are_retried_with_exponential_backoff():
+    sms = SMSStandIn(failures=2)
+    notifications = dispatcher(sms=sms, max_retries=3, retry_base_delay=0.1)
+    notifications.start()
+    await notifications.submit(Notification("sms", "+15550100", "", "36°C in London"))
+    await wait_for(lambda: len(sms.requests) == 3)
+    await notifications.stop(timeout=5)
+
+    first_delay, second_delay = (later - earlier for earlier, later in zip(sms.times, sms.times[1:]))
+    assert first_delay >= 0.1
+    assert second_delay >= 0.2
+
+async def test_gives_up_after_max_retries():
+    sms = SMSStandIn(failures=100)
+    notifications = dispatcher(sms=sms, max_retries=2, retry_base_delay=0.01)
+    notifications.start()
+    await notifications.submit(Notification("sms", "+15550100", "", "36°C in London"))
+    await wait_for(lambda: len(sms.requests) == 3)
+    await asyncio.sleep(0.2)
+    await notifications.stop(timeout=5)
+
+    assert len(sms.requests) == 3
+
+async def test_stop_gives_retries_in_backoff_a_last_attempt():
+    sms = SMSStandIn(failures=1)
+    notifications = dispatcher(sms=sms, max_retries=3, retry_base_delay=60)
+    notifications.start()
+    await notifications.submit(Notification("sms", "+15550100", "", "36°C in London"))
+    await wait_for(lambda: len(sms.requests) == 1)
+
+    start = time.monotonic()
+    await notifications.stop(timeout=5)
+
+    # Sent again right away instead of being dropped with its backoff timer
+    assert len(sms.requests) == 2
+    assert time.monotonic() - start < 1
+
+async def test_stop_counts_a_failed_last_attempt_as_failed():
+    sms = SMSStandIn(failures=100)
+    notifications = dispatcher(sms=sms, max_retries=3, retry_base_delay=60)
+    notifications.start()
+    await notifications.submit(Notification("sms", "+15550100", "", "36°C in London"))
+    await wait_for(lambda: len(sms.requests) == 1)
+    failed = REGISTRY.get_sample_value("weather_notifications_total", {"channel": "sms", "status": "failed"}) or 0
+
+    await notifications.stop(timeout=5)
+
+    assert len(sms.requests) == 2
+    assert REGISTRY.get_sample_value("weather_notifications_total", {"channel": "sms", "status": "failed"}) == failed + 1
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from app.core.security import PasswordHasher
+
+def blocking(release: threading.Event):
+    release.wait(5)
+    return True
+
+async def test_rejects_calls_beyond_the_running_and_waiting_limit():
+    hasher = PasswordHasher(workers=1, max_pending=1)
+    release = threading.Event()
+    running = asyncio.ensure_future(hasher._run(blocking, release))
+    waiting = asyncio.ensure_future(hasher._run(blocking, release))
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(HTTPException) as rejected:
+        await hasher._run(blocking, release)
+    assert rejected.value.status_code == 503
+
+    release.set()
+    assert await running and await waiting
+    hasher.shutdown()
+
+async def test_cancelled_calls_hold_their_slot_until_the_thread_finishes():
+    hasher = PasswordHasher(workers=1, max_pending=1)
+    release = threading.Event()
+    running = asyncio.ensure_future(hasher._run(blocking, release))
+    waiting = asyncio.ensure_future(hasher._run(blocking, release))
+    await asyncio.sleep(0.05)
+    running.cancel()
+    waiting.cancel()
+    await asyncio.sleep(0.05)
+
+    # The waiting call never started and frees its slot; the running one keeps its thread busy
+    queued = asyncio.ensure_future(hasher._run(blocking, release))
+    await asyncio.sleep(0.05)
+    with pytest.raises(HTTPException):
+        await hasher._run(blocking, release)
+
+    release.set()
+    assert await queued
+    hasher.shutdown()
@@ -0,0 +1,90 @@
+import pytest
+from app.services.poll_schedule import AdaptivePollSchedule
+
+THRESHOLDS = [("temperature", 35.0), ("temperature", 0.0), ("humidity", 80.0), ("aqi", 150.0)]
+
+def schedule():
+    return AdaptivePollSchedule(base_interval=300, min_interval=60, max_interval=1800)
+
+def calm_reading(temperature=20.0):
+    return {"city": "London", "temperature": temperature, "humidity": 50.0, "aqi": 40}
+
+def test_sync_spreads_new_cities_over_the_base_interval():
+    poll_schedule = schedule()
+    poll_schedule.sync(["a", "b", "c"], now=0)
+
+    assert len(poll_schedule) == 3
+    assert poll_schedule.pop_due(0) == ["a"]
+    assert poll_schedule.next_due() == pytest.approx(100)
+    assert poll_schedule.pop_due(250) == ["b", "c"]
+    assert poll_schedule.next_due() is None
+
+def test_sync_drops_unassigned_cities():
+    poll_schedule = schedule()
+    poll_schedule.sync(["a", "b"], now=0)
+    poll_schedule.sync(["b"], now=0)
+
+    assert len(poll_schedule) == 1
+    assert poll_schedule.pop_due(1000) == ["b"]
+
+def test_watched_cities_are_polled_more_often():
+    poll_schedule = schedule()
+
+    unwatched = poll_schedule.interval("a", calm_reading(), 0, THRESHOLDS)
+    watched = poll_schedule.interval("a", calm_reading(), 3, THRESHOLDS)
+    popular = poll_schedule.interval("a", calm_reading(), 100, THRESHOLDS)
+
+    assert unwatched == pytest.approx(600)
+    assert watched == pytest.approx(200)
+    assert popular < watched
+
+def test_readings_near_a_threshold_shorten_the_interval():
+    poll_schedule = schedule()
+
+    far = poll_schedule.interval("a", calm_reading(20.0), 3, THRESHOLDS)
+    near = poll_schedule.interval("a", calm_reading(33.0), 3, THRESHOLDS)
+
+    assert near == pytest.approx(far * 0.4)
+
+def test_volatile_cities_are_polled_more_often():
+    steady, volatile = schedule(), schedule()
+    for poll_schedule, temperatures in ((steady, [20, 20, 20]), (volatile, [14, 20, 26])):
+        poll_schedule.sync(["a"], now=0)
+        for temperature in temperatures:
+            poll_schedule.record("a", calm_reading(temperature), 0, THRESHOLDS, now=0)
+
+    assert volatile.interval("a", calm_reading(), 0, THRESHOLDS) < steady.interval("a", calm_reading(), 0, THRESHOLDS)
+
+def test_intervals_are_clamped():
+    poll_schedule = schedule()
+
+    assert poll_schedule.interval("a", calm_reading(34.9), 10_000, THRESHOLDS) == 60
+    assert AdaptivePollSchedule(base_interval=5000, min_interval=60, max_interval=1800).interval(
+        "a", calm_reading(), 0, THRESHOLDS
+    ) == 1800
+
+def test_failed_fetches_back_off_exponentially():
+    poll_schedule = schedule()
+    poll_schedule.sync(["a"], now=0)
+
+    intervals = [poll_schedule.record("a", None, 0, THRESHOLDS, now=0) for _ in range(6)]
+    assert intervals == [60, 120, 240, 480, 960, 1800]
+
+    # A successful fetch resets the backoff
+    poll_schedule.record("a", calm_reading(), 0, THRESHOLDS, now=0)
+    assert poll_schedule.record("a", None, 0, THRESHOLDS, now=0) == 60
+
+def test_record_reschedules_with_jitter():
+    poll_schedule = schedule()
+    poll_schedule.sync(["a"], now=0)
+    poll_schedule.pop_due(0)
+
+    interval = poll_schedule.record("a", calm_reading(), 3, THRESHOLDS, now=1000)
+
+    assert 1000 + interval * 0.9 <= poll_schedule.next_due() <= 1000 + interval * 1.1
+
+def test_record_ignores_unassigned_cities():
+    poll_schedule = schedule()
+
+    assert poll_schedule.record("a", calm_reading(), 0, THRESHOLDS, now=0) == 0.0
+    assert poll_schedule.next_due() is None
@@ -0,0 +1,73 @@
+from app.services.rule_engine import CustomAlertIndex, Rule
+
+def make_rule(rule_id, alert_type, threshold, city="London"):
+    return Rule(
+        id=rule_id,
+        user_id=1,
+        email="user@example.com",
+        city=city,
+        alert_type=alert_type,
+        threshold_value=threshold,
+        email_enabled=True,
+        sms_enabled=False
+    )
+
+def reading(city="London", temperature=20.0, humidity=50.0, aqi=None):
+    return {"city": city, "temperature": temperature, "humidity": humidity, "aqi": aqi}
+
+def matched_ids(index, reading):
+    return sorted(rule.id for rule, _ in index.match(reading))
+
+def test_match_high_rules_below_the_value():
+    index = CustomAlertIndex()
+    for rule in (make_rule(1, "temperature_high", 25), make_rule(2, "temperature_high", 30),
+                 make_rule(3, "temperature_high", 35)):
+        index.upsert(rule)
+
+    assert matched_ids(index, reading(temperature=31)) == [1, 2]
+    # Thresholds are exclusive
+    assert matched_ids(index, reading(temperature=30)) == [1]
+    assert matched_ids(index, reading(temperature=10)) == []
+
+def test_match_low_rules_above_the_value():
+    index = CustomAlertIndex()
+    for rule in (make_rule(1, "temperature_low", 0), make_rule(2, "temperature_low", 5)):
+        index.upsert(rule)
+
+    assert matched_ids(index, reading(temperature=-1)) == [1, 2]
+    assert matched_ids(index, reading(temperature=0)) == [2]
+    assert matched_ids(index, reading(temperature=5)) == []
+
+def test_match_returns_the_triggering_value():
+    index = CustomAlertIndex()
+    index.upsert(make_rule(1, "humidity", 80))
+
+    [(rule, value)] = index.match(reading(humidity=85))
+    assert rule.id == 1
+    assert value == 85
+
+def test_match_normalizes_city_and_skips_missing_values():
+    index = CustomAlertIndex()
+    index.upsert(make_rule(1, "aqi", 100, city="New  York"))
+
+    assert matched_ids(index, reading(city=" new york ", aqi=150)) == [1]
+    assert matched_ids(index, reading(city="new york", aqi=None)) == []
+    assert matched_ids(index, reading(city="London", aqi=150)) == []
+
+def test_upsert_replaces_and_remove_drops_rules():
+    index = CustomAlertIndex()
+    index.upsert(make_rule(1, "temperature_high", 25))
+    index.upsert(make_rule(1, "temperature_high", 40))
+
+    assert len(index) == 1
+    assert matched_ids(index, reading(temperature=30)) == []
+
+    index.remove(1)
+    assert len(index) == 0
+    assert matched_ids(index, reading(temperature=50)) == []
+
+def test_unknown_alert_types_are_not_indexed():
+    index = CustomAlertIndex()
+    index.upsert(make_rule(1, "pressure", 1000))
+
+    assert len(index) == 0
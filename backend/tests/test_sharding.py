@@ -0,0 +1,45 @@
+from collections import Counter
+from app.services.sharding import ShardCoordinator, owner
+
+WORKERS = ["worker-a", "worker-b", "worker-c"]
+CITIES = [f"city-{index}" for index in range(300)]
+
+def coordinator(worker_id, workers):
+    shard_coordinator = ShardCoordinator(redis_client=None, worker_id=worker_id, heartbeat_ttl=30)
+    shard_coordinator.workers = list(workers)
+    return shard_coordinator
+
+def test_owner_is_deterministic_and_order_independent():
+    for city in CITIES:
+        assert owner(city, WORKERS) == owner(city, list(reversed(WORKERS)))
+
+def test_owner_without_workers_is_none():
+    assert owner("london", []) is None
+
+def test_keys_spread_across_workers():
+    counts = Counter(owner(city, WORKERS) for city in CITIES)
+
+    assert set(counts) == set(WORKERS)
+    assert all(count > len(CITIES) / len(WORKERS) / 2 for count in counts.values())
+
+def test_only_a_departed_workers_keys_move():
+    before = {city: owner(city, WORKERS) for city in CITIES}
+    after = {city: owner(city, WORKERS[:2]) for city in CITIES}
+
+    moved = [city for city in CITIES if before[city] != after[city]]
+    assert moved
+    assert all(before[city] == "worker-c" for city in moved)
+
+def test_shards_partition_the_cities():
+    shards = [coordinator(worker_id, WORKERS).shard(CITIES) for worker_id in WORKERS]
+
+    assert sorted(city for shard in shards for city in shard) == sorted(CITIES)
+
+def test_shard_normalizes_city_names():
+    shard_coordinator = coordinator("worker-a", WORKERS)
+
+    for city in ("New York", "Sao Paulo", "London"):
+        assert shard_coordinator.owns(city) == shard_coordinator.owns(f"  {city.upper()} ")
+
+def test_single_worker_owns_everything():
+    assert coordinator("worker-a", ["worker-a"]).shard(CITIES) == CITIES
@@ -2,95 +2,309 @@ import asyncio
 import os
 import sys
 import logging
-from datetime import datetime
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
+from prometheus_client import start_http_server
 
 # Add parent directory to path to import backend modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
 from app.core.database import SessionLocal
 from app.services.weather_service import WeatherService
+from app.services.notification_dispatcher import Notification, NotificationDispatcher
+from app.services.retention import run_maintenance
+from app.services.rule_engine import CustomAlertIndex, follow_rule_changes, new_breaches
+from app.services.sharding import ShardCoordinator, load_cities
+from app.services.poll_schedule import AdaptivePollSchedule, city_subscriber_counts, global_thresholds
+from app.core.cache import normalize_city
 from app.core.config import settings
+from app.core.http_client import close_http_client
+from app.core.smtp_pool import close_smtp_pool
 import redis.asyncio as redis
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@dataclass
+class CycleStats:
+    """Outcome and timing of a single fetch cycle"""
+    cities: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    alerts: int = 0
+    custom_alerts: int = 0
+    duration: float = 0.0
+    
+    @property
+    def throughput(self) -> float:
+        """Cities processed per second"""
+        return self.cities / self.duration if self.duration else 0.0
+
 class WeatherScheduler:
     def __init__(self):
         self.weather_service = WeatherService()
-        self.cities = [
+        self.notifications = NotificationDispatcher()
+        self.rule_index = CustomAlertIndex()
+        self.rule_updates = None
+        self.concurrency = settings.SCHEDULER_CONCURRENCY
+        self.city_timeout = settings.SCHEDULER_CITY_TIMEOUT
+        self.default_cities = [
             "New York", "London", "Tokyo", "Sydney", "Mumbai", 
             "Berlin", "Paris", "Toronto", "Singapore", "Dubai"
         ]
+        # Every monitored city; each worker fetches only its shard of them
+        self.cities = list(self.default_cities)
+        self.coordinator = ShardCoordinator()
+        # Users who saved each city, by normalized name, used to weight polling
+        self.subscribers: Dict[str, int] = {}
+        self.schedule = AdaptivePollSchedule()
+        self.fetch_slots = asyncio.Semaphore(self.concurrency)
+        self.polls: Set[asyncio.Task] = set()
+        self.window = CycleStats()
+        self.window_start = time.perf_counter()
         self.redis_client = None
         
     async def initialize_redis(self):
         """Initialize Redis connection"""
         self.redis_client = redis.from_url(settings.REDIS_URL)
+        self.weather_service.bind_redis(self.redis_client)
+        self.coordinator.redis_client = self.redis_client
+        await self.heartbeat()
         
-    async def fetch_weather_for_all_cities(self):
-        """Fetch weather data for all monitored cities"""
-        logger.info(f"Starting weather fetch cycle at {datetime.now()}")
+        db = SessionLocal()
+        try:
+            seeded = await self.weather_service.coordinates.seed_from_db(db)
+            logger.info(f"Seeded coordinate cache with {seeded} cities")
+        finally:
+            db.close()
         
+        # Load custom alert rules, then follow changes made through the API
+        self.load_rules()
+        self.rule_updates = asyncio.create_task(
+            follow_rule_changes(self.redis_client, self.rule_index, on_resubscribe=self.load_rules)
+        )
+    
+    async def heartbeat(self):
+        """Keep this worker's membership alive and pick up workers joining or leaving"""
+        previous = self.coordinator.workers
+        try:
+            workers = await self.coordinator.heartbeat()
+        except Exception as e:
+            logger.error(f"Error sending scheduler heartbeat: {str(e)}")
+            return
+        if workers != previous:
+            logger.info(f"Scheduler workers changed to {len(workers)}: {', '.join(workers)}")
+    
+    def refresh_cities(self):
+        """Reload the monitored cities: the defaults plus every city users have saved or set custom alerts on"""
         db = SessionLocal()
         try:
-            for city in self.cities:
-                try:
-                    logger.info(f"Fetching weather for {city}")
-                    
-                    # Fetch weather data
-                    weather_data = await self.weather_service.fetch_weather_data(city)
-                    
-                    # Save to database
-                    reading = self.weather_service.save_weather_reading(db, weather_data)
-                    
-                    # Check thresholds and send alerts
-                    alerts = await self.weather_service.check_thresholds_and_alert(
-                        db, reading, self.redis_client
-                    )
-                    
-                    if alerts:
-                        logger.info(f"Generated {len(alerts)} alerts for {city}")
-                    
-                    logger.info(f"Successfully processed weather data for {city}")
-                    
-                except Exception as e:
-                    logger.error(f"Error processing weather for {city}: {str(e)}")
-                    continue
-                    
+            self.cities = load_cities(db, self.default_cities)
+            self.subscribers = city_subscriber_counts(db)
         except Exception as e:
-            logger.error(f"Error in weather fetch cycle: {str(e)}")
+            logger.error(f"Error loading cities, keeping {len(self.cities)} known: {str(e)}")
+        finally:
+            db.close()
+    
+    def load_rules(self):
+        """Rebuild the custom alert index from the database"""
+        db = SessionLocal()
+        try:
+            loaded = self.rule_index.load(db)
+            logger.info(f"Loaded {loaded} custom alert rules")
         finally:
             db.close()
+    
+    async def notify_custom_alerts(self, readings) -> int:
+        """Evaluate users' custom alerts against polled readings and queue emails for newly triggered ones"""
+        matches = [match for reading in readings for match in self.rule_index.match(reading)]
+        # A rule that stays in breach is only notified when it first crosses its threshold
+        matches = await new_breaches(self.redis_client, self.rule_index, readings, matches)
+        
+        emails: Dict[Tuple[str, str], Dict[str, None]] = {}
+        for rule, value in matches:
+            # Users have no phone number on file, so SMS preferences cannot be honoured yet
+            if not rule.email_enabled:
+                continue
+            subject = f"Weather alert for {rule.city}"
+            message = (f"{rule.alert_type.replace('_', ' ').capitalize()} alert: {value} in "
+                       f"{rule.city} crossed your threshold of {rule.threshold_value}")
+            emails.setdefault((subject, message), {})[rule.email] = None
+        
+        queued = 0
+        for (subject, message), recipients in emails.items():
+            # Users whose rules fire with the same text share one message over one SMTP session
+            if len(recipients) == 1:
+                notification = Notification("email", next(iter(recipients)), subject, message)
+            else:
+                notification = Notification.email_batch(list(recipients), subject, message)
+            await self.notifications.submit(notification)
+            queued += len(recipients)
+        return queued
+
+    async def fetch_city(self, city: str) -> Dict[str, Any]:
+        """Fetch weather data for a single city"""
+        logger.info(f"Fetching weather for {city}")
+        return await self.weather_service.fetch_weather_data(city)
+    
+    async def _fetch_city_bounded(self, city: str, stats: CycleStats) -> Optional[Dict[str, Any]]:
+        """Fetch one city under the concurrency limit and per-city timeout"""
+        async with self.fetch_slots:
+            try:
+                weather_data = await asyncio.wait_for(self.fetch_city(city), timeout=self.city_timeout)
+                stats.succeeded += 1
+                return weather_data
+            except asyncio.TimeoutError:
+                stats.timed_out += 1
+                logger.error(f"Timed out fetching weather for {city} after {self.city_timeout}s")
+            except Exception as e:
+                stats.failed += 1
+                logger.error(f"Error fetching weather for {city}: {str(e)}")
+        return None
+    
+    async def refresh_shard(self):
+        """Reload cities, renew membership and schedule the cities this worker now owns"""
+        self.refresh_cities()
+        await self.heartbeat()
+        cities = self.coordinator.shard(self.cities)
+        self.schedule.sync(cities, time.time())
+        
+        window = self.window
+        window.duration = time.perf_counter() - self.window_start
+        if window.cities:
+            logger.info(
+                f"Polled {window.succeeded}/{window.cities} cities succeeded, {window.failed} failed, "
+                f"{window.timed_out} timed out, {window.alerts} alerts, {window.custom_alerts} custom alerts "
+                f"in the last {window.duration:.0f}s ({window.throughput:.2f} cities/s)"
+            )
+        logger.info(
+            f"Scheduling {len(cities)} of {len(self.cities)} cities on worker "
+            f"{self.coordinator.worker_id} ({len(self.coordinator.workers)} workers)"
+        )
+        self.window = CycleStats()
+        self.window_start = time.perf_counter()
+    
+    async def run_polling(self):
+        """Poll each city when it falls due, reloading the shard every refresh interval"""
+        last_refresh = None
+        while True:
+            now = time.time()
+            if last_refresh is None or now - last_refresh >= settings.SCHEDULER_REFRESH_INTERVAL:
+                await self.refresh_shard()
+                last_refresh = now
+            
+            due = self.schedule.pop_due(time.time())
+            if due:
+                task = asyncio.create_task(self.poll_cities(due))
+                self.polls.add(task)
+                task.add_done_callback(self.polls.discard)
             
-        logger.info("Weather fetch cycle completed")
+            wake_at = last_refresh + settings.SCHEDULER_REFRESH_INTERVAL
+            next_due = self.schedule.next_due()
+            if next_due is not None:
+                wake_at = min(wake_at, next_due)
+            await asyncio.sleep(max(wake_at - time.time(), 0.05))
+    
+    async def poll_cities(self, cities: List[str]) -> CycleStats:
+        """Fetch the due cities concurrently, persist them in one batch and reschedule each one"""
+        stats = CycleStats(cities=len(cities))
+        start_time = time.perf_counter()
+        
+        results = await asyncio.gather(*(self._fetch_city_bounded(city, stats) for city in cities))
+        readings = [weather_data for weather_data in results if weather_data is not None]
+        
+        now = time.time()
+        for city, weather_data in zip(cities, results):
+            thresholds = self.rule_index.thresholds(city)
+            subscribers = self.subscribers.get(normalize_city(city), 0) + len(thresholds)
+            self.schedule.record(city, weather_data, subscribers, global_thresholds() + thresholds, now)
+        
+        if readings:
+            db = SessionLocal()
+            try:
+                # Save readings and check thresholds for the whole batch in one transaction
+                alerts = await self.weather_service.save_cycle(db, readings, self.redis_client)
+                stats.alerts = len(alerts)
+            except Exception as e:
+                logger.error(f"Error saving polled weather: {str(e)}")
+            finally:
+                db.close()
+            
+            try:
+                stats.custom_alerts = await self.notify_custom_alerts(readings)
+            except Exception as e:
+                logger.error(f"Error evaluating custom alerts: {str(e)}")
+        
+        stats.duration = time.perf_counter() - start_time
+        for field in ("cities", "succeeded", "failed", "timed_out", "alerts", "custom_alerts"):
+            setattr(self.window, field, getattr(self.window, field) + getattr(stats, field))
+        return stats
+
+    async def maintain_readings_table(self):
+        """Create partitions, refresh rollups and drop readings past retention"""
+        # Only one worker maintains the shared table
+        if not self.coordinator.owns("readings-maintenance"):
+            return
+        try:
+            # Runs in a thread so heartbeats and polling keep going during long rollups
+            await asyncio.to_thread(self._run_maintenance)
+            logger.info("Readings table maintenance completed")
+        except Exception as e:
+            logger.error(f"Error in readings table maintenance: {str(e)}")
+    
+    def _run_maintenance(self):
+        db = SessionLocal()
+        try:
+            run_maintenance(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
 
 async def main():
     """Main scheduler function"""
     scheduler_instance = WeatherScheduler()
     await scheduler_instance.initialize_redis()
+    scheduler_instance.notifications.start()
+    
+    # Expose alert publish metrics from this process for Prometheus
+    if settings.SCHEDULER_METRICS_PORT:
+        start_http_server(settings.SCHEDULER_METRICS_PORT)
     
     # Create scheduler
     scheduler = AsyncIOScheduler()
     
-    # Schedule weather fetching every 5 minutes
+    # Heartbeat so other workers know this one is alive and cities rebalance when one dies
+    scheduler.add_job(
+        scheduler_instance.heartbeat,
+        trigger=IntervalTrigger(seconds=settings.SCHEDULER_HEARTBEAT_INTERVAL),
+        id='scheduler_heartbeat',
+        name='Scheduler worker heartbeat',
+        replace_existing=True
+    )
+    
+    # Maintain partitions, rollups and retention every hour
     scheduler.add_job(
-        scheduler_instance.fetch_weather_for_all_cities,
-        trigger=IntervalTrigger(minutes=5),
-        id='weather_fetch',
-        name='Fetch weather data for all cities',
+        scheduler_instance.maintain_readings_table,
+        trigger=IntervalTrigger(hours=1),
+        id='readings_maintenance',
+        name='Maintain weather readings partitions and rollups',
         replace_existing=True
     )
     
     # Start scheduler
     scheduler.start()
-    logger.info("Weather scheduler started - fetching data every 5 minutes")
+    logger.info("Weather scheduler started - polling each city on its own adaptive interval")
     
-    # Run initial fetch
-    await scheduler_instance.fetch_weather_for_all_cities()
+    # Run initial maintenance, then poll cities as they fall due
+    await scheduler_instance.maintain_readings_table()
+    polling = asyncio.create_task(scheduler_instance.run_polling())
     
     try:
         # Keep the scheduler running
@@ -99,6 +313,12 @@ async def main():
     except KeyboardInterrupt:
         logger.info("Shutting down scheduler...")
         scheduler.shutdown()
+        polling.cancel()
+        scheduler_instance.rule_updates.cancel()
+        await scheduler_instance.coordinator.leave()
+        await scheduler_instance.notifications.stop()
+        await close_http_client()
+        await close_smtp_pool()
         await scheduler_instance.redis_client.close()
 
 if __name__ == "__main__":